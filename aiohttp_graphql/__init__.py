@@ -1,3 +1,27 @@
-from graphql_server.aiohttp.graphqlview import GraphQLView
+from importlib import import_module
 
-__all__ = ["GraphQLView"]
+__all__ = ["Federation", "GraphQLView", "LiveQueryView", "ResolverCache", "run_app"]
+
+# The public names are imported from their modules on first access, so that
+# importing the package does not pull in aiohttp and the graphql-core stack.
+_exports = {
+    "Federation": ".federation",
+    "GraphQLView": ".graphqlview",
+    "LiveQueryView": ".live",
+    "ResolverCache": ".cache",
+    "run_app": ".runner",
+}
+
+
+def __getattr__(name):
+    try:
+        module = _exports[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,228 @@
+"""Memoization of resolver results with a TTL and tag based invalidation.
+
+Resolvers are cached either with the :py:meth:`ResolverCache.cached` decorator
+or, for schemas built from SDL, with the ``@cached`` directive::
+
+    directive @cached(ttl: Int, tags: [String!]) on FIELD_DEFINITION
+
+Cached values are keyed by field, parent identity and arguments.
+"""
+import time
+from collections import OrderedDict, defaultdict
+from functools import wraps
+from inspect import isawaitable
+
+from graphql import (
+    DirectiveLocation,
+    GraphQLArgument,
+    GraphQLDirective,
+    GraphQLInt,
+    GraphQLList,
+    GraphQLNonNull,
+    GraphQLObjectType,
+    GraphQLString,
+    default_field_resolver,
+)
+from graphql.execution.values import get_directive_values
+
+__all__ = ["CacheDirective", "LRUBackend", "ResolverCache"]
+
+CacheDirective = GraphQLDirective(
+    name="cached",
+    locations=[DirectiveLocation.FIELD_DEFINITION],
+    args={
+        "ttl": GraphQLArgument(GraphQLInt, description="Time to live in seconds."),
+        "tags": GraphQLArgument(
+            GraphQLList(GraphQLNonNull(GraphQLString)),
+            description="Tags used to invalidate the cached values.",
+        ),
+    },
+    description="Memoize the results of the field resolver.",
+)
+
+_missing = object()
+
+
+class LRUBackend:
+    """In-process cache backend evicting the least recently used entries.
+
+    Backends implement ``get(key, default)``, ``set(key, value, ttl)`` and
+    ``delete(key)``, so other stores can be plugged into :py:class:`ResolverCache`.
+    Backends with an ``on_evict`` attribute call it with the keys they drop, so
+    that the cache can forget their tags.
+    """
+
+    def __init__(self, maxsize=1024, timer=time.monotonic, on_evict=None):
+        self.maxsize = maxsize
+        self.timer = timer
+        self.on_evict = on_evict
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        try:
+            expires, value = self._entries[key]
+        except KeyError:
+            return default
+        if expires is not None and expires <= self.timer():
+            del self._entries[key]
+            self._evicted(key)
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl=None):
+        expires = None if ttl is None else self.timer() + ttl
+        self._entries[key] = expires, value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._evicted(self._entries.popitem(last=False)[0])
+
+    def delete(self, key):
+        if self._entries.pop(key, _missing) is not _missing:
+            self._evicted(key)
+
+    def clear(self):
+        keys = list(self._entries)
+        self._entries.clear()
+        for key in keys:
+            self._evicted(key)
+
+    def _evicted(self, key):
+        if self.on_evict is not None:
+            self.on_evict(key)
+
+
+class ResolverCache:
+    """Cache of resolver results shared by all the requests.
+
+    ``tags`` given to :py:meth:`cached` are either a list of strings or a
+    function of the parent and the arguments returning one, and
+    :py:meth:`invalidate` drops all values cached under any of the given tags,
+    e.g. from a mutation resolver.
+    """
+
+    def __init__(self, backend=None, default_ttl=60):
+        self.backend = LRUBackend() if backend is None else backend
+        self.default_ttl = default_ttl
+        # tag -> keys and key -> tags, pruned when the backend drops the keys.
+        self._tags = {}
+        self._key_tags = {}
+        if hasattr(self.backend, "on_evict"):
+            self.backend.on_evict = self._forget
+        self._stats = defaultdict(lambda: [0, 0])
+
+    def cached(self, ttl=None, tags=()):
+        """Decorate a resolver so that its results are memoized."""
+        ttl = self.default_ttl if ttl is None else ttl
+
+        def decorator(resolve):
+            @wraps(resolve)
+            def cached_resolve(parent, info, **args):
+                field = f"{info.parent_type.name}.{info.field_name}"
+                key = (field, _freeze_parent(parent), _freeze(args))
+                stats = self._stats[field]
+                try:
+                    hash(key)
+                except TypeError:
+                    # Parents and arguments without a stable key are not cached.
+                    stats[1] += 1
+                    return resolve(parent, info, **args)
+
+                value = self.backend.get(key, _missing)
+                if value is not _missing:
+                    stats[0] += 1
+                    return value
+                stats[1] += 1
+
+                field_tags = tags(parent, args) if callable(tags) else tags
+                result = resolve(parent, info, **args)
+                if isawaitable(result):
+                    return self._store_async(key, result, ttl, field_tags)
+                self._store(key, result, ttl, field_tags)
+                return result
+
+            return cached_resolve
+
+        return decorator
+
+    async def _store_async(self, key, result, ttl, tags):
+        value = await result
+        self._store(key, value, ttl, tags)
+        return value
+
+    def _store(self, key, value, ttl, tags):
+        # The key is indexed first, as the backend may evict it right away.
+        self._forget(key)
+        if tags:
+            self._key_tags[key] = tags
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+        self.backend.set(key, value, ttl)
+
+    def _forget(self, key):
+        for tag in self._key_tags.pop(key, ()):
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate(self, *tags):
+        """Drop the values cached under any of the given tags."""
+        for tag in tags:
+            for key in self._tags.pop(tag, ()):
+                self._forget(key)
+                self.backend.delete(key)
+
+    def stats(self):
+        """Return the hits, misses and hit rate of every cached field."""
+        return {
+            field: {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            }
+            for field, (hits, misses) in self._stats.items()
+        }
+
+    def apply_directives(self, schema):
+        """Cache the resolvers of the fields annotated with ``@cached``.
+
+        Fields added by ``extend type`` are annotated the same way. Fields of
+        types defined in code have no SDL and are left alone.
+        """
+        for type_ in schema.type_map.values():
+            if not isinstance(type_, GraphQLObjectType) or type_.name.startswith(
+                "__"
+            ):
+                continue
+            for field in type_.fields.values():
+                if field.ast_node is None:  # fields defined in code
+                    continue
+                values = get_directive_values(CacheDirective, field.ast_node)
+                if values is None:
+                    continue
+                field.resolve = self.cached(
+                    ttl=values.get("ttl"), tags=values.get("tags") or ()
+                )(field.resolve or default_field_resolver)
+        return schema
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _freeze_parent(parent):
+    try:
+        hash(parent)
+    except TypeError:
+        # Other unhashable parents give an unhashable key, and are not cached.
+        return _freeze(parent)
+    return parent
@@ -0,0 +1,157 @@
+"""Variable coercers compiled once per operation.
+
+graphql-core coerces the variables of every request by walking the variable
+definitions and input types of the operation. The coercers built here flatten
+that walk into nested closures with the scalar ``parse_value`` functions bound
+in advance. They only implement the success path: on any invalid input they
+raise :py:class:`InvalidVariables`, and the caller falls back to graphql-core,
+which reports the errors.
+"""
+from collections.abc import Iterable
+from copy import deepcopy
+
+from graphql import (
+    GraphQLInputObjectType,
+    GraphQLList,
+    GraphQLNonNull,
+    is_input_type,
+    type_from_ast,
+    value_from_ast,
+)
+from graphql.pyutils import Undefined
+
+__all__ = ["InvalidVariables", "compile_input_coercer", "compile_variables_coercer"]
+
+
+class InvalidVariables(Exception):
+    """Raised by a compiled coercer when an input value is invalid."""
+
+
+def compile_input_coercer(type_, _coercers=None):
+    """Return a function coercing a Python value to the given input type."""
+    coercers = {} if _coercers is None else _coercers
+
+    if isinstance(type_, GraphQLNonNull):
+        coerce_inner = compile_input_coercer(type_.of_type, coercers)
+
+        def coerce_non_null(value):
+            if value is None or value is Undefined:
+                raise InvalidVariables
+            return coerce_inner(value)
+
+        return coerce_non_null
+
+    if isinstance(type_, GraphQLList):
+        coerce_item = compile_input_coercer(type_.of_type, coercers)
+
+        def coerce_list(value):
+            if value is None or value is Undefined:
+                return None
+            if isinstance(value, Iterable) and not isinstance(value, str):
+                return [coerce_item(item) for item in value]
+            # Lists accept a non-list value as a list of one.
+            return [coerce_item(value)]
+
+        return coerce_list
+
+    if isinstance(type_, GraphQLInputObjectType):
+        # Input objects may be recursive, so their coercers are memoized by
+        # type and their fields compiled on first use.
+        if type_.name in coercers:
+            return coercers[type_.name]
+        plan = []
+
+        def coerce_object(value):
+            if value is None or value is Undefined:
+                return None
+            if not isinstance(value, dict):
+                raise InvalidVariables
+            if not plan:
+                compile_fields()
+            coerced = {}
+            for name, out_name, coerce_field, default, required in plan:
+                field_value = value.get(name, Undefined)
+                if field_value is Undefined:
+                    if default is not Undefined:
+                        coerced[out_name] = default
+                    elif required:
+                        raise InvalidVariables
+                    continue
+                coerced[out_name] = coerce_field(field_value)
+            for name in value:
+                if name not in fields:
+                    raise InvalidVariables
+            return type_.out_type(coerced)
+
+        fields = type_.fields
+
+        def compile_fields():
+            plan.extend(
+                (
+                    name,
+                    field.out_name or name,
+                    compile_input_coercer(field.type, coercers),
+                    field.default_value,
+                    isinstance(field.type, GraphQLNonNull),
+                )
+                for name, field in fields.items()
+            )
+
+        coercers[type_.name] = coerce_object
+        return coerce_object
+
+    parse_value = type_.parse_value
+
+    def coerce_leaf(value):
+        if value is None or value is Undefined:
+            return None
+        try:
+            result = parse_value(value)
+        except Exception:
+            raise InvalidVariables
+        if result is Undefined:
+            raise InvalidVariables
+        return result
+
+    return coerce_leaf
+
+
+def compile_variables_coercer(schema, variable_definitions):
+    """Return a function coercing the raw variables of an operation.
+
+    Returns None if the definitions use types that are not input types, which
+    validation normally rules out, so that graphql-core reports it.
+    """
+    coercers = {}
+    plan = []
+    for definition in variable_definitions or ():
+        type_ = type_from_ast(schema, definition.type)
+        if type_ is None or not is_input_type(type_):
+            return None
+        default = Undefined
+        if definition.default_value:
+            default = value_from_ast(definition.default_value, type_)
+        plan.append(
+            (
+                definition.variable.name.value,
+                compile_input_coercer(type_, coercers),
+                default,
+                isinstance(type_, GraphQLNonNull),
+            )
+        )
+
+    def coerce_variables(inputs):
+        coerced = {}
+        for name, coerce, default, required in plan:
+            if name not in inputs:
+                if default is not Undefined:
+                    if isinstance(default, (dict, list)):
+                        default = deepcopy(default)
+                    coerced[name] = default
+                elif required:
+                    raise InvalidVariables
+                continue
+            coerced[name] = coerce(inputs[name])
+        return coerced
+
+    return coerce_variables
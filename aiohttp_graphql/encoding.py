@@ -0,0 +1,54 @@
+"""Serialization of execution results without intermediate response dicts."""
+from json import JSONEncoder
+
+from graphql_server import ServerResponse, format_error_default
+
+# ``json.dumps`` builds a new encoder for every call made with non-default
+# separators, so a single compact encoder is shared instead.
+_encode = JSONEncoder(separators=(",", ":")).encode
+
+
+def encode_execution_result(execution_result, format_error=format_error_default):
+    """Serialize one ExecutionResult, returning the JSON text and the status code.
+
+    This produces the same output as ``format_execution_result`` followed by
+    ``json_encode``, but the executor's data is encoded in place and the errors
+    are only formatted when there are any.
+    """
+    if execution_result is None:
+        return "null", 200
+
+    data = execution_result.data
+    errors = execution_result.errors
+    if not errors:
+        return '{"data":' + _encode(data) + "}", 200
+
+    encoded_errors = _encode([format_error(error) for error in errors])
+    if any(not getattr(error, "path", None) for error in errors):
+        return '{"errors":' + encoded_errors + "}", 400
+    return '{"errors":' + encoded_errors + ',"data":' + _encode(data) + "}", 200
+
+
+def encode_execution_results(
+    execution_results, format_error=format_error_default, is_batch=False
+):
+    """Serialize the ExecutionResults like ``graphql_server.encode_execution_results``.
+
+    Returns a ServerResponse tuple with the JSON text as the first item and the
+    highest status code of the results as the second item.
+    """
+    if not is_batch:
+        return ServerResponse(
+            *encode_execution_result(execution_results[0], format_error)
+        )
+
+    status_code = 200
+    parts = []
+    for execution_result in execution_results:
+        text, result_status_code = encode_execution_result(
+            execution_result, format_error
+        )
+        parts.append(text)
+        if result_status_code > status_code:
+            status_code = result_status_code
+    return ServerResponse("[" + ",".join(parts) + "]", status_code)
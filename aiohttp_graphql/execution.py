@@ -0,0 +1,358 @@
+"""Execution of GraphQL HTTP queries with a per-document cache.
+
+This mirrors ``graphql_server.run_http_query``, but the documents are parsed and
+validated once per query string, and the operation, fragments and compiled
+variable coercer of each executed operation are kept with the document, so
+that a hot document only pays for coercing its variables and executing.
+"""
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+from graphql import (
+    ExecutionContext,
+    ExecutionResult,
+    FragmentDefinitionNode,
+    GraphQLError,
+    OperationDefinitionNode,
+    default_field_resolver,
+    default_type_resolver,
+    execute,
+    parse,
+    validate,
+    validate_schema,
+)
+from graphql.execution.middleware import MiddlewareManager
+from graphql.execution.values import get_variable_values
+from graphql.language import DocumentNode, OperationType
+from graphql.pyutils import FrozenList
+from graphql.type.schema import GraphQLSchema
+from graphql.utilities import get_operation_ast
+
+from graphql_server import GraphQLResponse, HttpQueryError, get_graphql_params
+
+from .coercion import InvalidVariables, compile_variables_coercer
+
+__all__ = ["CachedExecutionContext", "DocumentCache", "run_http_query"]
+
+
+class CachedDocument(DocumentNode):
+    """A parsed document keeping the execution plans and costs of its operations."""
+
+    __slots__ = ("plans", "costs")
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.plans = {}
+        self.costs = {}
+
+
+# Visitors dispatch on the kind of the nodes, and the plans and costs are not
+# part of the AST, so the document keeps the kind and keys of a plain document.
+CachedDocument.kind = DocumentNode.kind
+CachedDocument.keys = DocumentNode.keys
+
+
+class DocumentCache:
+    """LRU cache of the parsed and validated documents of query strings."""
+
+    def __init__(self, schema, maxsize=1024):
+        self.schema = schema
+        self.maxsize = maxsize
+        self.documents = OrderedDict()
+
+    def get(self, query, validation_rules=None, max_errors=None):
+        """Return the document of ``query`` and its validation errors.
+
+        Raises :py:class:`GraphQLError` if the query cannot be parsed.
+        """
+        key = (query, tuple(validation_rules) if validation_rules else None)
+        entry = self.documents.get(key)
+        if entry is not None:
+            self.documents.move_to_end(key)
+            return entry
+        return self.add(key, query, validation_rules, max_errors)
+
+    def add(self, key, query, validation_rules, max_errors):
+        document = parse(query)
+        document = CachedDocument(loc=document.loc, definitions=document.definitions)
+        errors = validate(
+            self.schema, document, rules=validation_rules, max_errors=max_errors
+        )
+        entry = document, errors
+        self.documents[key] = entry
+        if len(self.documents) > self.maxsize:
+            self.documents.popitem(last=False)
+        return entry
+
+    def clear(self):
+        self.documents.clear()
+
+    def __len__(self):
+        return len(self.documents)
+
+
+def compile_plan(schema, document, operation_name):
+    """Return the operation, fragments and variables coercer of an operation.
+
+    Returns a list of errors if the operation cannot be determined.
+    """
+    operation = None
+    fragments = {}
+    for definition in document.definitions:
+        if isinstance(definition, OperationDefinitionNode):
+            if operation_name is None:
+                if operation:
+                    return [
+                        GraphQLError(
+                            "Must provide operation name"
+                            " if query contains multiple operations."
+                        )
+                    ]
+                operation = definition
+            elif definition.name and definition.name.value == operation_name:
+                operation = definition
+        elif isinstance(definition, FragmentDefinitionNode):
+            fragments[definition.name.value] = definition
+
+    if not operation:
+        if operation_name is not None:
+            return [GraphQLError(f"Unknown operation named '{operation_name}'.")]
+        return [GraphQLError("Must provide an operation.")]
+
+    coercer = compile_variables_coercer(schema, operation.variable_definitions)
+    return operation, fragments, coercer
+
+
+class CachedExecutionContext(ExecutionContext):
+    """Execution context reusing the plans kept by a :py:class:`CachedDocument`.
+
+    Variables are coerced by the compiled coercer of the operation. Invalid
+    variables are coerced again by graphql-core, which reports the errors.
+    """
+
+    @classmethod
+    def build(
+        cls,
+        schema,
+        document,
+        root_value=None,
+        context_value=None,
+        raw_variable_values=None,
+        operation_name=None,
+        field_resolver=None,
+        type_resolver=None,
+        middleware=None,
+        is_awaitable=None,
+    ):
+        plans = getattr(document, "plans", None)
+        if plans is None:
+            return super().build(
+                schema,
+                document,
+                root_value,
+                context_value,
+                raw_variable_values,
+                operation_name,
+                field_resolver,
+                type_resolver,
+                middleware,
+                is_awaitable,
+            )
+
+        middleware_manager = None
+        if middleware is not None:
+            if isinstance(middleware, (list, tuple)):
+                middleware_manager = MiddlewareManager(*middleware)
+            elif isinstance(middleware, MiddlewareManager):
+                middleware_manager = middleware
+            else:
+                raise TypeError(
+                    "Middleware must be passed as a list or tuple of functions"
+                    " or objects, or as a single MiddlewareManager object."
+                    f" Got {middleware!r} instead."
+                )
+
+        plan = plans.get(operation_name)
+        if plan is None:
+            plan = compile_plan(schema, document, operation_name)
+            if isinstance(plan, list):
+                return plan  # errors
+            # Only the plans of valid operation names are kept, so that
+            # arbitrary names sent by clients cannot grow the document.
+            plans[operation_name] = plan
+        operation, fragments, coercer = plan
+
+        raw_variable_values = raw_variable_values or {}
+        coerced_variable_values = None
+        if coercer is not None:
+            try:
+                coerced_variable_values = coercer(raw_variable_values)
+            except InvalidVariables:
+                pass
+        if coerced_variable_values is None:
+            coerced_variable_values = get_variable_values(
+                schema,
+                operation.variable_definitions or FrozenList(),
+                raw_variable_values,
+                max_errors=50,
+            )
+            if isinstance(coerced_variable_values, list):
+                return coerced_variable_values  # errors
+
+        return cls(
+            schema,
+            fragments,
+            root_value,
+            context_value,
+            operation,
+            coerced_variable_values,
+            field_resolver or default_field_resolver,
+            type_resolver or default_type_resolver,
+            [],
+            middleware_manager,
+            is_awaitable,
+        )
+
+
+class _NoException(Exception):
+    pass
+
+
+def run_http_query(
+    schema,
+    request_method,
+    data,
+    query_data=None,
+    batch_enabled=False,
+    catch=False,
+    run_sync=True,
+    document_cache=None,
+    **execute_options,
+):
+    """Execute GraphQL coming from an HTTP query against a given schema.
+
+    Takes the arguments of ``graphql_server.run_http_query``, and the
+    :py:class:`DocumentCache` of the schema, if any.
+    """
+    if not isinstance(schema, GraphQLSchema):
+        raise TypeError(f"Expected a GraphQL schema, but received {schema!r}.")
+    if request_method not in ("get", "post"):
+        raise HttpQueryError(
+            405,
+            "GraphQL only supports GET and POST requests.",
+            headers={"Allow": "GET, POST"},
+        )
+    catch_exc = HttpQueryError if catch else _NoException
+    is_batch = isinstance(data, list)
+    allow_only_query = request_method == "get"
+
+    if not is_batch:
+        if not isinstance(data, (dict, MutableMapping)):
+            raise HttpQueryError(
+                400, f"GraphQL params should be a dict. Received {data!r}."
+            )
+        data = [data]
+    elif not batch_enabled:
+        raise HttpQueryError(400, "Batch GraphQL requests are not enabled.")
+
+    if not data:
+        raise HttpQueryError(400, "Received an empty list in the batch request.")
+
+    # If is a batch request, we don't consume the data from the query
+    extra_data = {} if is_batch else query_data or {}
+
+    all_params = [get_graphql_params(entry, extra_data) for entry in data]
+    results = [
+        get_response(
+            schema,
+            params,
+            catch_exc,
+            allow_only_query,
+            run_sync,
+            document_cache=document_cache,
+            **execute_options,
+        )
+        for params in all_params
+    ]
+    return GraphQLResponse(results, all_params)
+
+
+def _assume_not_awaitable(_value):
+    return False
+
+
+def get_response(
+    schema,
+    params,
+    catch_exc,
+    allow_only_query=False,
+    run_sync=True,
+    validation_rules=None,
+    max_errors=None,
+    document_cache=None,
+    **kwargs,
+):
+    """Get an individual execution result as response, with option to catch errors.
+
+    Like ``graphql_server.get_response``, but the document and its validation
+    errors come from ``document_cache`` when it is given.
+    """
+    try:
+        if not params.query:
+            raise HttpQueryError(400, "Must provide query string.")
+
+        # Sanity check query
+        if not isinstance(params.query, str):
+            raise HttpQueryError(400, "Unexpected query type.")
+
+        schema_validation_errors = validate_schema(schema)
+        if schema_validation_errors:
+            return ExecutionResult(data=None, errors=schema_validation_errors)
+
+        validation_errors = None
+        try:
+            if document_cache is None:
+                document = parse(params.query)
+            else:
+                document, validation_errors = document_cache.get(
+                    params.query, validation_rules, max_errors
+                )
+        except GraphQLError as e:
+            return ExecutionResult(data=None, errors=[e])
+        except Exception as e:
+            e = GraphQLError(str(e), original_error=e)
+            return ExecutionResult(data=None, errors=[e])
+
+        if allow_only_query:
+            operation_ast = get_operation_ast(document, params.operation_name)
+            if operation_ast:
+                operation = operation_ast.operation.value
+                if operation != OperationType.QUERY.value:
+                    raise HttpQueryError(
+                        405,
+                        f"Can only perform a {operation} operation"
+                        " from a POST request.",
+                        headers={"Allow": "POST"},
+                    )
+
+        if validation_errors is None:
+            validation_errors = validate(
+                schema, document, rules=validation_rules, max_errors=max_errors
+            )
+        if validation_errors:
+            return ExecutionResult(data=None, errors=validation_errors)
+
+        execution_result = execute(
+            schema,
+            document,
+            variable_values=params.variables,
+            operation_name=params.operation_name,
+            is_awaitable=_assume_not_awaitable if run_sync else None,
+            execution_context_class=CachedExecutionContext,
+            **kwargs,
+        )
+
+    except catch_exc:
+        return None
+
+    return execution_result
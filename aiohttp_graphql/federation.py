@@ -0,0 +1,233 @@
+"""Apollo Federation subgraph support.
+
+:py:meth:`Federation.build_schema` adds the ``_service`` and ``_entities``
+fields of the subgraph specification to a schema. Entity types are declared
+with the :py:meth:`Federation.entity` decorator, or, for schemas built from
+SDL, with the ``@key`` directive::
+
+    directive @key(fields: String!, resolvable: Boolean = true) repeatable on OBJECT
+
+The representations sent to ``_entities`` are grouped by ``__typename``, and
+each group is resolved by a single call of the reference resolver of its type,
+which receives the list of representations and returns the list of entities in
+the same order. The groups of async reference resolvers run concurrently.
+"""
+import asyncio
+import re
+from inspect import isawaitable
+
+from graphql import (
+    DirectiveLocation,
+    GraphQLArgument,
+    GraphQLBoolean,
+    GraphQLDirective,
+    GraphQLError,
+    GraphQLNonNull,
+    GraphQLObjectType,
+    GraphQLString,
+    extend_schema,
+    parse,
+    print_schema,
+)
+from graphql.execution.values import get_directive_values
+
+__all__ = ["Federation", "KeyDirective"]
+
+FEDERATION_SPEC = "https://specs.apollo.dev/federation/v2.0"
+
+KeyDirective = GraphQLDirective(
+    name="key",
+    locations=[DirectiveLocation.OBJECT],
+    args={
+        "fields": GraphQLArgument(GraphQLNonNull(GraphQLString)),
+        "resolvable": GraphQLArgument(GraphQLBoolean, default_value=True),
+    },
+    is_repeatable=True,
+    description="Declare the fields identifying the entities of a type.",
+)
+
+
+class Entity:
+    """An entity type, its keys and its batched reference resolver."""
+
+    def __init__(self, type_name, keys, resolve_references=None):
+        self.type_name = type_name
+        self.keys = keys
+        self.resolve_references = resolve_references
+
+
+class Federation:
+    def __init__(self):
+        self.entities = {}
+
+    def entity(self, type_name, key="id", resolvable=True):
+        """Declare ``type_name`` as an entity, decorating its reference resolver.
+
+        The reference resolver is called as ``resolver(representations, info)``
+        with all the representations of the type in a request, and returns (or
+        resolves to) the list of their entities, ``None`` for the missing ones.
+        ``key`` is a field set, or a list of them for types with several keys.
+        """
+        if isinstance(key, str):
+            key = [key]
+        entity = Entity(type_name, [(fields, resolvable) for fields in key])
+        self.entities[type_name] = entity
+
+        def decorator(resolve_references):
+            entity.resolve_references = resolve_references
+            return resolve_references
+
+        return decorator
+
+    def build_schema(self, schema):
+        """Return ``schema`` with the fields of a federation subgraph.
+
+        The ``@key`` directives of the types built from SDL are read first.
+        The ``_service`` and ``_entities`` fields are added to the query type
+        of a new schema, ``schema`` itself is left unchanged.
+        """
+        for type_ in schema.type_map.values():
+            if not isinstance(type_, GraphQLObjectType) or not type_.ast_node:
+                continue
+            keys = [
+                (values["fields"], values.get("resolvable", True))
+                for values in _get_repeated_directive_values(KeyDirective, type_)
+            ]
+            if keys and type_.name not in self.entities:
+                self.entities[type_.name] = Entity(type_.name, keys)
+
+        unknown = [name for name in self.entities if name not in schema.type_map]
+        if unknown:
+            raise TypeError(f"Unknown entity types: {', '.join(unknown)}.")
+
+        sdl = self.print_sdl(schema)
+        entity_names = [
+            entity.type_name
+            for entity in self.entities.values()
+            if any(resolvable for _, resolvable in entity.keys)
+        ]
+        # extend_schema rebuilds every type, keeping their resolvers, so the
+        # types referencing the query type get the extended one.
+        extension = ["scalar _Any", "type _Service { sdl: String }"]
+        query_fields = ["_service: _Service!"]
+        if entity_names:
+            extension.append(f"union _Entity = {' | '.join(entity_names)}")
+            query_fields.append("_entities(representations: [_Any!]!): [_Entity]!")
+        extension.append(
+            f"extend type {schema.query_type.name} {{ {' '.join(query_fields)} }}"
+        )
+        schema = extend_schema(schema, parse("\n".join(extension)))
+
+        fields = schema.query_type.fields
+        fields["_service"].resolve = lambda _root, _info: {"sdl": sdl}
+        if entity_names:
+            # Entities are dicts given a __typename by _place, or objects with a
+            # __typename attribute or an is_type_of function, as graphql-core's
+            # default type resolver expects.
+            fields["_entities"].resolve = self.resolve_entities
+        return schema
+
+    def print_sdl(self, schema):
+        """Return the SDL of ``schema`` with the ``@key`` directives applied."""
+        sdl = print_schema(schema)
+        if self.entities:
+            names = "|".join(re.escape(name) for name in self.entities)
+            sdl = re.sub(
+                fr"^type ({names})\b([^{{\n]*?) ?{{",
+                self._add_keys,
+                sdl,
+                flags=re.MULTILINE,
+            )
+        link = f'extend schema @link(url: "{FEDERATION_SPEC}", import: ["@key"])'
+        return f"{link}\n\n{sdl}"
+
+    def _add_keys(self, match):
+        directives = "".join(
+            f' @key(fields: "{fields}")'
+            if resolvable
+            else f' @key(fields: "{fields}", resolvable: false)'
+            for fields, resolvable in self.entities[match.group(1)].keys
+        )
+        return f"type {match.group(1)}{match.group(2)}{directives} {{"
+
+    def resolve_entities(self, _root, info, representations):
+        groups = {}
+        for index, representation in enumerate(representations):
+            typename = (
+                representation.get("__typename")
+                if isinstance(representation, dict)
+                else None
+            )
+            groups.setdefault(typename, []).append(index)
+
+        entities = [None] * len(representations)
+        pending = []
+        for typename, indices in groups.items():
+            entity = self.entities.get(typename)
+            group = [representations[index] for index in indices]
+            if entity is None:
+                values = GraphQLError(f"Unknown entity type {typename!r}.")
+            elif entity.resolve_references is None:
+                values = group
+            else:
+                try:
+                    values = entity.resolve_references(group, info)
+                except Exception as error:
+                    values = error
+                if isawaitable(values):
+                    pending.append((typename, indices, values))
+                    continue
+            _place(entities, typename, indices, values)
+
+        if pending:
+            return _gather_entities(entities, pending)
+        return entities
+
+
+async def _gather_entities(entities, pending):
+    results = await asyncio.gather(
+        *(values for _, _, values in pending), return_exceptions=True
+    )
+    for (typename, indices, _), values in zip(pending, results):
+        _place(entities, typename, indices, values)
+    return entities
+
+
+def _place(entities, typename, indices, values):
+    """Put the entities resolved for ``indices`` at their positions."""
+    if not isinstance(values, Exception):
+        values = list(values)
+        if len(values) != len(indices):
+            values = GraphQLError(
+                f"The reference resolver of {typename!r} returned {len(values)}"
+                f" entities for {len(indices)} representations."
+            )
+    if isinstance(values, Exception):
+        # graphql-core reports an exception returned as a list item at its path.
+        for index in indices:
+            entities[index] = values
+        return
+    for index, value in zip(indices, values):
+        if isinstance(value, dict) and "__typename" not in value:
+            value = dict(value, __typename=typename)
+        entities[index] = value
+
+
+def _get_repeated_directive_values(directive, type_):
+    nodes = [type_.ast_node, *(type_.extension_ast_nodes or ())]
+    for node in nodes:
+        for directive_node in node.directives or ():
+            if directive_node.name.value == directive.name:
+                # get_directive_values only reads the first use of a directive.
+                values = get_directive_values(
+                    directive, _SingleDirective(directive_node)
+                )
+                if values is not None:
+                    yield values
+
+
+class _SingleDirective:
+    __slots__ = ("directives",)
+
+    def __init__(self, directive_node):
+        self.directives = [directive_node]
@@ -0,0 +1,472 @@
+import asyncio
+import copy
+import json
+from collections.abc import MutableMapping
+from contextlib import AsyncExitStack
+from functools import partial
+from inspect import isawaitable
+from typing import List
+
+from aiohttp import web
+from graphql import ExecutionResult, GraphQLError, specified_rules
+from graphql.type.schema import GraphQLSchema
+
+from graphql_server import (
+    GraphQLParams,
+    HttpQueryError,
+    encode_execution_results,
+    format_error_default,
+    format_execution_result,
+    json_encode,
+    load_json_body,
+)
+
+from .encoding import encode_execution_result
+from .encoding import encode_execution_results as encode_execution_results_compact
+from .execution import DocumentCache, run_http_query
+
+NDJSON = "application/x-ndjson"
+
+# Where the view keeps the ``extensions`` of the operations in the request.
+EXTENSIONS_KEY = (
+    web.RequestKey("graphql_extensions", object)
+    if hasattr(web, "RequestKey")
+    else "graphql_extensions"
+)
+
+
+class GraphQLView:
+    schema = None
+    root_value = None
+    context = None
+    pretty = False
+    graphiql = False
+    graphiql_version = None
+    graphiql_template = None
+    graphiql_html_title = None
+    middleware = None
+    validation_rules = None
+    batch = False
+    jinja_env = None
+    max_age = 86400
+    enable_async = False
+    subscriptions = None
+    headers = None
+    default_query = None
+    header_editor_enabled = None
+    should_persist_headers = None
+    sse = False
+    sse_heartbeat = 12.0
+    sse_buffer_size = 100
+    sse_retention = 30.0
+    profiler = None
+    batch_stream = False
+    document_cache_size = 1024
+    context_factory = None
+    root_value_factory = None
+    rate_limiter = None
+
+    accepted_methods = ["GET", "POST", "PUT", "DELETE"]
+
+    format_error = staticmethod(format_error_default)
+    encode = staticmethod(json_encode)
+
+    def __init__(self, **kwargs):
+        super(GraphQLView, self).__init__()
+        for key, value in kwargs.items():
+            if hasattr(self, key):
+                setattr(self, key, value)
+
+        if not isinstance(self.schema, GraphQLSchema):
+            # maybe the GraphQL schema is wrapped in a Graphene schema
+            self.schema = getattr(self.schema, "graphql_schema", None)
+            if not isinstance(self.schema, GraphQLSchema):
+                raise TypeError("A Schema is required to be provided to GraphQLView.")
+
+        self._sse_handler = None
+        self._document_cache = None
+
+    def get_root_value(self):
+        return self.root_value
+
+    def get_context(self, request):
+        context = (
+            copy.copy(self.context)
+            if self.context and isinstance(self.context, MutableMapping)
+            else {}
+        )
+        if isinstance(context, MutableMapping) and "request" not in context:
+            context.update({"request": request})
+        return context
+
+    async def enter_factory(self, factory, request, resources):
+        """Return the value made by ``factory`` for ``request``.
+
+        The factory may return a value, an awaitable or an async context
+        manager, which is entered on ``resources`` and exited once the
+        response is written.
+        """
+        value = factory(request)
+        if hasattr(value, "__aenter__"):
+            return await resources.enter_async_context(value)
+        if isawaitable(value):
+            return await value
+        return value
+
+    async def get_execution_values(self, request, resources):
+        """Return the root and context values of the operations of ``request``."""
+        if self.root_value_factory is None:
+            root_value = self.get_root_value()
+        else:
+            root_value = await self.enter_factory(
+                self.root_value_factory, request, resources
+            )
+        if self.context_factory is None:
+            context_value = self.get_context(request)
+        else:
+            context_value = await self.enter_factory(
+                self.context_factory, request, resources
+            )
+        return root_value, context_value
+
+    def get_middleware(self):
+        return self.middleware
+
+    def get_validation_rules(self):
+        if self.validation_rules is None:
+            return specified_rules
+        return self.validation_rules
+
+    @staticmethod
+    async def parse_body(request):
+        content_type = request.content_type
+        # request.text() is the aiohttp equivalent to
+        # request.body.decode("utf8")
+        if content_type == "application/graphql":
+            r_text = await request.text()
+            return {"query": r_text}
+
+        if content_type == "application/json":
+            text = await request.text()
+            return load_json_body(text)
+
+        if content_type in (
+            "application/x-www-form-urlencoded",
+            "multipart/form-data",
+        ):
+            # TODO: seems like a multidict would be more appropriate
+            #  than casting it and de-duping variables. Alas, it's what
+            #  graphql-python wants.
+            return dict(await request.post())
+
+        return {}
+
+    @staticmethod
+    def get_extensions(request, data):
+        """Return the ``extensions`` sent with the operations.
+
+        Federation routers send their query plan hints there. A batch gets the
+        list of the extensions of its operations.
+        """
+        if isinstance(data, list):
+            return [
+                entry.get("extensions") if isinstance(entry, dict) else None
+                for entry in data
+            ]
+        extensions = data.get("extensions") if isinstance(data, dict) else None
+        extensions = extensions or request.query.get("extensions")
+        if extensions and isinstance(extensions, str):
+            try:
+                return json.loads(extensions)
+            except ValueError:
+                raise HttpQueryError(400, "Extensions are invalid JSON.")
+        return extensions
+
+    # TODO:
+    #  use this method to replace flask and sanic
+    #  checks as this is equivalent to `should_display_graphiql` and
+    #  `request_wants_html` methods.
+    def is_graphiql(self, request):
+        return all(
+            [
+                self.graphiql,
+                request.method.lower() == "get",
+                "raw" not in request.query,
+                any(
+                    [
+                        "text/html" in request.headers.get("accept", {}),
+                        "*/*" in request.headers.get("accept", {}),
+                    ]
+                ),
+            ]
+        )
+
+    def is_batch_stream(self, request, data):
+        return all(
+            [
+                self.batch,
+                self.batch_stream,
+                isinstance(data, list),
+                NDJSON in request.headers.get("accept", ""),
+            ]
+        )
+
+    # TODO: Same stuff as above method.
+    def is_pretty(self, request):
+        return any(
+            [self.pretty, self.is_graphiql(request), request.query.get("pretty")]
+        )
+
+    def get_document_cache(self):
+        """Return the cache of parsed and validated documents, if enabled."""
+        if not self.document_cache_size:
+            return None
+        if self._document_cache is None:
+            self._document_cache = DocumentCache(self.schema, self.document_cache_size)
+        return self._document_cache
+
+    def get_sse_handler(self, request):
+        """Return the handler of ``request`` if it uses the SSE transport."""
+        if not self.sse or request.method == "OPTIONS":
+            return None
+        from .sse import SSEHandler, is_sse_request
+
+        if not is_sse_request(request):
+            return None
+        if self._sse_handler is None:
+            self._sse_handler = SSEHandler(self)
+        return self._sse_handler
+
+    async def __call__(self, request):
+        sse_handler = self.get_sse_handler(request)
+        if sse_handler is not None:
+            return await sse_handler(request)
+
+        if self.context_factory is None and self.root_value_factory is None:
+            return await self.handle(request, None)
+
+        # The resources of the request are shared by all the operations of a
+        # batch, and released once the response is written.
+        async with AsyncExitStack() as resources:
+            response = await self.handle(request, resources)
+            await response.prepare(request)
+            await response.write_eof()
+        return response
+
+    async def handle(self, request, resources):
+        profile = self.profiler.start() if self.profiler is not None else None
+        all_params: List[GraphQLParams] = []
+        status_code = 200
+        try:
+            data = await self.parse_body(request)
+            if profile is not None:
+                profile.mark("parse")
+            request_method = request.method.lower()
+            is_graphiql = self.is_graphiql(request)
+            is_pretty = self.is_pretty(request)
+
+            # TODO: way better than if-else so better
+            #  implement this too on flask and sanic
+            if request_method == "options":
+                return self.process_preflight(request)
+
+            request[EXTENSIONS_KEY] = self.get_extensions(request, data)
+            if self.rate_limiter is not None:
+                await self.rate_limiter.check(request, self, data)
+
+            root_value, context_value = await self.get_execution_values(
+                request, resources
+            )
+
+            execution_results, all_params = run_http_query(
+                self.schema,
+                request_method,
+                data,
+                query_data=request.query,
+                batch_enabled=self.batch,
+                catch=is_graphiql,
+                # Execute options
+                run_sync=not self.enable_async,
+                root_value=root_value,
+                context_value=context_value,
+                middleware=self.get_middleware(),
+                validation_rules=self.get_validation_rules(),
+                document_cache=self.get_document_cache(),
+            )
+
+            if self.is_batch_stream(request, data):
+                return await self.stream_batch(request, execution_results)
+
+            exec_res = (
+                [
+                    ex if ex is None or isinstance(ex, ExecutionResult) else await ex
+                    for ex in execution_results
+                ]
+                if self.enable_async
+                else execution_results
+            )
+            if profile is not None:
+                profile.mark("execute")
+            if self.encode is json_encode and not is_pretty:
+                result, status_code = encode_execution_results_compact(
+                    exec_res,
+                    is_batch=isinstance(data, list),
+                    format_error=self.format_error,
+                )
+            else:
+                result, status_code = encode_execution_results(
+                    exec_res,
+                    is_batch=isinstance(data, list),
+                    format_error=self.format_error,
+                    encode=partial(self.encode, pretty=is_pretty),  # noqa: ignore
+                )
+            if profile is not None:
+                profile.mark("encode")
+
+            if is_graphiql:
+                # The GraphiQL renderer (and Jinja) is only needed by browsers,
+                # so it is imported on first use instead of with this module.
+                from graphql_server.render_graphiql import (
+                    GraphiQLConfig,
+                    GraphiQLData,
+                    GraphiQLOptions,
+                    render_graphiql_async,
+                )
+
+                graphiql_data = GraphiQLData(
+                    result=result,
+                    query=getattr(all_params[0], "query"),
+                    variables=getattr(all_params[0], "variables"),
+                    operation_name=getattr(all_params[0], "operation_name"),
+                    subscription_url=self.subscriptions,
+                    headers=self.headers,
+                )
+                graphiql_config = GraphiQLConfig(
+                    graphiql_version=self.graphiql_version,
+                    graphiql_template=self.graphiql_template,
+                    graphiql_html_title=self.graphiql_html_title,
+                    jinja_env=self.jinja_env,
+                )
+                graphiql_options = GraphiQLOptions(
+                    default_query=self.default_query,
+                    header_editor_enabled=self.header_editor_enabled,
+                    should_persist_headers=self.should_persist_headers,
+                )
+                source = await render_graphiql_async(
+                    data=graphiql_data, config=graphiql_config, options=graphiql_options
+                )
+                if profile is not None:
+                    profile.mark("graphiql")
+                return web.Response(text=source, content_type="text/html")
+
+            return web.Response(
+                text=result,
+                status=status_code,
+                content_type="application/json",
+            )
+
+        except HttpQueryError as err:
+            status_code = err.status_code
+            parsed_error = GraphQLError(err.message)
+            return web.Response(
+                body=self.encode(dict(errors=[self.format_error(parsed_error)])),
+                status=err.status_code,
+                headers=err.headers,
+                content_type="application/json",
+            )
+
+        except Exception:
+            status_code = 500
+            raise
+
+        finally:
+            if profile is not None:
+                self.profiler.finish(profile, all_params, status_code)
+
+    async def stream_batch(self, request, execution_results):
+        """Write the result of each operation of the batch as soon as it is done.
+
+        The response is newline-delimited JSON, each line holding the ``index``
+        of the operation in the batch, its ``status`` and its ``payload``.
+        """
+        response = web.StreamResponse(headers={"Content-Type": NDJSON})
+        await response.prepare(request)
+        for future in asyncio.as_completed(
+            [_indexed(index, result) for index, result in enumerate(execution_results)]
+        ):
+            index, execution_result = await future
+            if self.encode is json_encode:
+                payload, status_code = encode_execution_result(
+                    execution_result, self.format_error
+                )
+                line = f'{{"index":{index},"status":{status_code},"payload":{payload}}}'
+            else:
+                payload, status_code = format_execution_result(
+                    execution_result, self.format_error
+                )
+                line = self.encode(
+                    {"index": index, "status": status_code, "payload": payload}
+                )
+            await response.write(line.encode() + b"\n")
+        await response.write_eof()
+        return response
+
+    def process_preflight(self, request):
+        """
+        Preflight request support for apollo-client
+        https://www.w3.org/TR/cors/#resource-preflight-requests
+        """
+        headers = request.headers
+        origin = headers.get("Origin", "")
+        method = headers.get("Access-Control-Request-Method", "").upper()
+
+        if method and method in self.accepted_methods:
+            return web.Response(
+                status=200,
+                headers={
+                    "Access-Control-Allow-Origin": origin,
+                    "Access-Control-Allow-Methods": ", ".join(self.accepted_methods),
+                    "Access-Control-Max-Age": str(self.max_age),
+                },
+            )
+        return web.Response(status=400)
+
+    @classmethod
+    def attach(cls, app, *, route_path="/graphql", route_name="graphql", **kwargs):
+        view = cls(**kwargs)
+        app.router.add_route("*", route_path, _asyncify(view), name=route_name)
+        return view
+
+
+async def _indexed(index, execution_result):
+    if execution_result is not None and not isinstance(
+        execution_result, ExecutionResult
+    ):
+        execution_result = await execution_result
+    return index, execution_result
+
+
+def find_views(app):
+    """Return the :py:class:`GraphQLView` instances attached to ``app``."""
+    views = []
+    for route in app.router.routes():
+        view = getattr(route.handler, "view", None)
+        if isinstance(view, GraphQLView) and view not in views:
+            views.append(view)
+    return views
+
+
+def _asyncify(handler):
+    """Return an async version of the given handler.
+
+    This is mainly here because ``aiohttp`` can't infer the async definition of
+    :py:meth:`.GraphQLView.__call__` and raises a :py:class:`DeprecationWarning`
+    in tests. Wrapping it into an async function avoids the noisy warning. The
+    view is kept on the wrapper so that helpers can find it from the router.
+    """
+
+    async def _dispatch(request):
+        return await handler(request)
+
+    _dispatch.view = handler
+    return _dispatch
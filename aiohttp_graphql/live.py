@@ -0,0 +1,307 @@
+"""Live queries pushed as JSON patches over a WebSocket.
+
+A client starts an operation by sending::
+
+    {"type": "start", "id": "1", "payload": {"query": "query @live { ... }"}}
+
+and receives the full result in a ``data`` message. For queries marked with the
+``@live`` directive the server then re-executes the operation whenever one of
+the resources it touched is published on the :py:class:`InvalidationBus`, and
+sends the changes as RFC 6902 operations in ``patch`` messages. Other
+operations are answered with a single ``data`` message followed by ``complete``.
+A client sends ``{"type": "stop", "id": "1"}`` to end a live query.
+
+The resources touched by an operation are the names of the object types whose
+fields were resolved, plus anything resolvers report with :py:func:`track`.
+"""
+import asyncio
+import copy
+import logging
+from collections.abc import MutableMapping
+from functools import partial
+from inspect import isawaitable
+
+from aiohttp import WSMsgType, web
+from graphql import GraphQLError, execute, parse, specified_rules, validate
+from graphql.language import DocumentNode, OperationType
+from graphql.pyutils import FrozenList
+from graphql.type.schema import GraphQLSchema
+from graphql.utilities import get_operation_ast
+
+from graphql_server import format_error_default, format_execution_result
+
+from .graphqlview import _asyncify
+
+__all__ = ["InvalidationBus", "LiveQueryView", "json_diff", "track"]
+
+logger = logging.getLogger(__name__)
+
+LIVE_DIRECTIVE = "live"
+RESOURCES_KEY = "live_resources"
+
+
+class InvalidationBus:
+    """Broadcast the resources invalidated by mutations to the live queries."""
+
+    def __init__(self):
+        self._listeners = set()
+
+    def listen(self):
+        queue = asyncio.Queue()
+        self._listeners.add(queue)
+        return queue
+
+    def unlisten(self, queue):
+        self._listeners.discard(queue)
+
+    def publish(self, *resources):
+        resources = frozenset(resources)
+        for queue in self._listeners:
+            queue.put_nowait(resources)
+
+
+def track(info, *resources):
+    """Record that the current live query depends on the given resources."""
+    context = info.context
+    if isinstance(context, MutableMapping) and RESOURCES_KEY in context:
+        context[RESOURCES_KEY].update(resources)
+
+
+def json_diff(old, new, path=""):
+    """Return the RFC 6902 operations turning ``old`` into ``new``."""
+    if old == new:
+        return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": _pointer(path, key)})
+        for key, value in new.items():
+            if key in old:
+                ops.extend(json_diff(old[key], value, _pointer(path, key)))
+            else:
+                ops.append({"op": "add", "path": _pointer(path, key), "value": value})
+        return ops
+    if isinstance(old, list) and isinstance(new, list):
+        ops = []
+        common = min(len(old), len(new))
+        for index in range(common):
+            ops.extend(json_diff(old[index], new[index], _pointer(path, index)))
+        for index in range(common, len(new)):
+            ops.append({"op": "add", "path": _pointer(path, "-"), "value": new[index]})
+        for index in reversed(range(common, len(old))):
+            ops.append({"op": "remove", "path": _pointer(path, index)})
+        return ops
+    return [{"op": "replace", "path": path, "value": new}]
+
+
+def _pointer(path, key):
+    return f"{path}/{str(key).replace('~', '~0').replace('/', '~1')}"
+
+
+def _track_types(resolve, parent, info, **args):
+    context = info.context
+    if isinstance(context, MutableMapping) and RESOURCES_KEY in context:
+        context[RESOURCES_KEY].add(info.parent_type.name)
+    return resolve(parent, info, **args)
+
+
+def _forget(operations, op_id, task):
+    """Remove a finished operation, logging its failure if any."""
+    if operations.get(op_id) is task:
+        del operations[op_id]
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Live operation %r failed.", op_id, exc_info=task.exception())
+
+
+def _strip_live(document, operation_name):
+    """Return the document without the ``@live`` directive and whether it had it.
+
+    Raises :py:class:`GraphQLError` if the directive is used on a mutation or a
+    subscription.
+    """
+    operation = get_operation_ast(document, operation_name)
+    directives = operation.directives if operation else None
+    live = [
+        directive
+        for directive in directives or ()
+        if directive.name.value == LIVE_DIRECTIVE
+    ]
+    if not live:
+        return document, False
+    if operation.operation != OperationType.QUERY:
+        raise GraphQLError(
+            f"Directive '@{LIVE_DIRECTIVE}' may only be used on queries.", live
+        )
+
+    stripped = copy.copy(operation)
+    stripped.directives = FrozenList(
+        directive
+        for directive in operation.directives
+        if directive.name.value != LIVE_DIRECTIVE
+    )
+    definitions = FrozenList(
+        stripped if definition is operation else definition
+        for definition in document.definitions
+    )
+    return DocumentNode(definitions=definitions, loc=document.loc), True
+
+
+class LiveQueryView:
+    schema = None
+    root_value = None
+    context = None
+    middleware = None
+    validation_rules = None
+    bus = None
+    debounce = 0.05
+    heartbeat = 30.0
+
+    format_error = staticmethod(format_error_default)
+
+    def __init__(self, **kwargs):
+        super(LiveQueryView, self).__init__()
+        for key, value in kwargs.items():
+            if hasattr(self, key):
+                setattr(self, key, value)
+
+        if not isinstance(self.schema, GraphQLSchema):
+            # maybe the GraphQL schema is wrapped in a Graphene schema
+            self.schema = getattr(self.schema, "graphql_schema", None)
+            if not isinstance(self.schema, GraphQLSchema):
+                raise TypeError("A Schema is required to be provided to LiveQueryView.")
+        if self.bus is None:
+            self.bus = InvalidationBus()
+
+    def get_root_value(self):
+        return self.root_value
+
+    def get_context(self, request):
+        context = (
+            copy.copy(self.context)
+            if self.context and isinstance(self.context, MutableMapping)
+            else {}
+        )
+        if isinstance(context, MutableMapping) and "request" not in context:
+            context.update({"request": request})
+        return context
+
+    def get_middleware(self):
+        return [_track_types, *(self.middleware or ())]
+
+    def get_validation_rules(self):
+        if self.validation_rules is None:
+            return specified_rules
+        return self.validation_rules
+
+    async def __call__(self, request):
+        ws = web.WebSocketResponse(heartbeat=self.heartbeat)
+        await ws.prepare(request)
+        operations = {}
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                try:
+                    message = msg.json()
+                    op_type, op_id = message.get("type"), message.get("id")
+                except (ValueError, AttributeError):
+                    await ws.send_json(
+                        {"type": "error", "payload": [{"message": "Invalid message."}]}
+                    )
+                    continue
+
+                if op_type == "start":
+                    if op_id in operations:
+                        operations.pop(op_id).cancel()
+                    task = asyncio.ensure_future(
+                        self.run_operation(
+                            ws, request, op_id, message.get("payload") or {}
+                        )
+                    )
+                    task.add_done_callback(partial(_forget, operations, op_id))
+                    operations[op_id] = task
+                elif op_type == "stop" and op_id in operations:
+                    operations.pop(op_id).cancel()
+        finally:
+            for task in operations.values():
+                task.cancel()
+        return ws
+
+    async def execute(self, request, document, params):
+        context = self.get_context(request)
+        resources = set()
+        if isinstance(context, MutableMapping):
+            context[RESOURCES_KEY] = resources
+        result = execute(
+            self.schema,
+            document,
+            root_value=self.get_root_value(),
+            context_value=context,
+            variable_values=params.get("variables"),
+            operation_name=params.get("operationName"),
+            middleware=self.get_middleware(),
+        )
+        if isawaitable(result):
+            result = await result
+        return format_execution_result(result, self.format_error).result, resources
+
+    async def send_errors(self, ws, op_id, errors):
+        await ws.send_json(
+            {
+                "type": "error",
+                "id": op_id,
+                "payload": [self.format_error(error) for error in errors],
+            }
+        )
+
+    async def run_operation(self, ws, request, op_id, params):
+        variables = params.get("variables")
+        if variables is not None and not isinstance(variables, MutableMapping):
+            await self.send_errors(
+                ws, op_id, [GraphQLError("Variables must be an object.")]
+            )
+            return
+        try:
+            document = parse(params.get("query") or "")
+            document, is_live = _strip_live(document, params.get("operationName"))
+        except GraphQLError as error:
+            await self.send_errors(ws, op_id, [error])
+            return
+        errors = validate(self.schema, document, self.get_validation_rules())
+        if errors:
+            await self.send_errors(ws, op_id, errors)
+            return
+
+        queue = self.bus.listen() if is_live else None
+        try:
+            last, resources = await self.execute(request, document, params)
+            await ws.send_json({"type": "data", "id": op_id, "payload": last})
+            if not is_live:
+                await ws.send_json({"type": "complete", "id": op_id})
+                return
+
+            while not ws.closed:
+                if not resources & await queue.get():
+                    continue
+                # Coalesce the bursts of invalidations into one re-execution.
+                await asyncio.sleep(self.debounce)
+                while not queue.empty():
+                    queue.get_nowait()
+
+                result, resources = await self.execute(request, document, params)
+                patch = json_diff(last, result)
+                if patch:
+                    await ws.send_json({"type": "patch", "id": op_id, "payload": patch})
+                    last = result
+        finally:
+            if queue is not None:
+                self.bus.unlisten(queue)
+
+    @classmethod
+    def attach(
+        cls, app, *, route_path="/graphql/live", route_name="graphql-live", **kwargs
+    ):
+        view = cls(**kwargs)
+        app.router.add_route("GET", route_path, _asyncify(view), name=route_name)
+        return view
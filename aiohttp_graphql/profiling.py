@@ -0,0 +1,283 @@
+"""Sampling profiler and slow-query log for :py:class:`GraphQLView`.
+
+A :py:class:`SlowQueryProfiler` passed as the ``profiler`` option of the view
+records the phase timings of every request. A ``sample_rate`` fraction of the
+requests is also profiled with ``cProfile`` and ``tracemalloc``. Sampled
+requests and requests slower than ``threshold`` seconds are written, with their
+operation names, redacted variables and queries, as JSON lines to a rotating log.
+
+The worst offenders of a log are listed with::
+
+    python -m aiohttp_graphql.profiling slow_queries.log --top 10
+"""
+import argparse
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import time
+import tracemalloc
+from logging.handlers import RotatingFileHandler
+
+from aiohttp import web
+from graphql import (
+    FloatValueNode,
+    GraphQLError,
+    IntValueNode,
+    StringValueNode,
+    Visitor,
+    parse,
+    print_ast,
+    visit,
+)
+
+__all__ = ["SlowQueryProfiler", "redact_query", "redact_variables", "worst_offenders"]
+
+REDACTED = "[REDACTED]"
+SENSITIVE_KEYS = re.compile(r"pass|secret|token|auth|key|credential", re.IGNORECASE)
+OPERATION_NAME = re.compile(r"^\s*(?:query|mutation|subscription)\s+(\w+)")
+
+
+def redact_variables(variables):
+    """Replace the values of the variables whose names look sensitive."""
+    if isinstance(variables, dict):
+        return {
+            key: REDACTED if SENSITIVE_KEYS.search(key) else redact_variables(value)
+            for key, value in variables.items()
+        }
+    if isinstance(variables, list):
+        return [redact_variables(value) for value in variables]
+    return variables
+
+
+class _LiteralRedactor(Visitor):
+    def enter_string_value(self, node, *_args):
+        return StringValueNode(value=REDACTED, block=False)
+
+    def enter_int_value(self, node, *_args):
+        return IntValueNode(value="0")
+
+    def enter_float_value(self, node, *_args):
+        return FloatValueNode(value="0.0")
+
+
+def redact_query(query):
+    """Return ``query`` with its string and number literals masked.
+
+    Queries that cannot be parsed are not logged, as they could hold anything.
+    """
+    if not query or not isinstance(query, str):
+        return None
+    try:
+        document = parse(query, no_location=True)
+    except GraphQLError:
+        return None
+    return print_ast(visit(document, _LiteralRedactor()))
+
+
+def operation_name(params):
+    """Return the requested operation name, or the name of the first operation."""
+    if params.operation_name:
+        return params.operation_name
+    match = OPERATION_NAME.match(params.query or "")
+    return match.group(1) if match else None
+
+
+class RequestProfile:
+    """Timings (and, when sampled, profiles) of one request."""
+
+    def __init__(self, sampled):
+        self.sampled = sampled
+        self.phases = {}
+        self.start = self._last = time.perf_counter()
+        self.profile = None
+        self.memory = None
+        self._tracing = False
+        if sampled:
+            self._tracing = not tracemalloc.is_tracing()
+            if self._tracing:
+                tracemalloc.start()
+            self.memory_start = tracemalloc.get_traced_memory()[0]
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    def mark(self, phase):
+        """Record the time elapsed since the previous mark as ``phase``."""
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self._last
+        self._last = now
+
+    def stop(self):
+        self.duration = time.perf_counter() - self.start
+        if self.sampled:
+            self.profile.disable()
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot() if self._tracing else None
+            if self._tracing:
+                tracemalloc.stop()
+            self.memory = {
+                "allocated": current - self.memory_start,
+                "peak": peak - self.memory_start,
+            }
+            if snapshot is not None:
+                self.memory["top"] = [
+                    [str(stat.traceback[0]), stat.size, stat.count]
+                    for stat in snapshot.statistics("lineno")[:10]
+                ]
+
+
+class SlowQueryProfiler:
+    def __init__(
+        self,
+        path="slow_queries.log",
+        sample_rate=0.0,
+        threshold=1.0,
+        max_bytes=10 * 1024 * 1024,
+        backup_count=5,
+        redact=redact_variables,
+        redact_query=redact_query,
+        top=25,
+    ):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.redact = redact
+        self.redact_query = redact_query
+        self.top = top
+        self._profiling = False
+        # The logger is owned by the profiler rather than registered with the
+        # logging module, so that it and its file are released with it.
+        self.logger = logging.Logger(__name__, logging.INFO)
+        self._file_handler = RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, delay=True
+        )
+        self._file_handler.setFormatter(logging.Formatter("%(message)s"))
+        self.logger.addHandler(self._file_handler)
+
+    def close(self):
+        """Close the log file."""
+        self.logger.removeHandler(self._file_handler)
+        self._file_handler.close()
+
+    def start(self):
+        # cProfile and tracemalloc are process wide, so only one request is
+        # sampled at a time.
+        sampled = not self._profiling and random.random() < self.sample_rate
+        if sampled:
+            self._profiling = True
+        return RequestProfile(sampled)
+
+    def finish(self, profile, all_params=(), status=200):
+        profile.stop()
+        if profile.sampled:
+            self._profiling = False
+        if not profile.sampled and profile.duration < self.threshold:
+            return None
+
+        entry = {
+            "time": time.time(),
+            "duration": profile.duration,
+            "status": status,
+            "sampled": profile.sampled,
+            "phases": profile.phases,
+            "operations": [
+                {
+                    "operation_name": operation_name(params),
+                    "variables": self.redact(params.variables),
+                    "query": self.redact_query(params.query),
+                }
+                for params in all_params
+            ],
+        }
+        if profile.sampled:
+            entry["memory"] = profile.memory
+            entry["profile"] = self.format_profile(profile.profile)
+        self.logger.info(json.dumps(entry, default=str))
+        return entry
+
+    def format_profile(self, profile):
+        stats = pstats.Stats(profile, stream=io.StringIO())
+        rows = sorted(
+            stats.stats.items(), key=lambda item: item[1][3], reverse=True
+        )[: self.top]
+        return [
+            {
+                "function": f"{filename}:{line}({name})",
+                "calls": calls,
+                "tottime": tottime,
+                "cumtime": cumtime,
+            }
+            for (filename, line, name), (_, calls, tottime, cumtime, _) in rows
+        ]
+
+    async def handler(self, request):
+        """List the worst offenders of the log, ``?top=N`` of them."""
+        top = int(request.query.get("top", 10))
+        return web.json_response(worst_offenders(log_files(self.path), top))
+
+
+def log_files(path):
+    """Return the log file and its existing rotated backups."""
+    files = [path]
+    index = 1
+    while os.path.exists(f"{path}.{index}"):
+        files.append(f"{path}.{index}")
+        index += 1
+    return [file for file in files if os.path.exists(file)]
+
+
+def worst_offenders(paths, top=10):
+    """Return the ``top`` slowest operations logged in ``paths``."""
+    operations = {}
+    for path in paths:
+        with open(path) as log_file:
+            for line in log_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                names = [
+                    operation["operation_name"] or operation["query"] or "<anonymous>"
+                    for operation in entry["operations"]
+                ] or ["<unknown>"]
+                for name in names:
+                    stats = operations.setdefault(
+                        name,
+                        {"operation": name, "count": 0, "total": 0.0, "max": -1.0},
+                    )
+                    stats["count"] += 1
+                    stats["total"] += entry["duration"]
+                    if entry["duration"] > stats["max"]:
+                        stats["max"] = entry["duration"]
+                        stats["worst"] = entry
+    ranked = sorted(operations.values(), key=lambda stats: stats["max"], reverse=True)
+    for stats in ranked:
+        stats["mean"] = stats.pop("total") / stats["count"]
+    return ranked[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="List the slowest operations of a slow-query log."
+    )
+    parser.add_argument("path", help="the slow-query log (rotated files included)")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    for stats in worst_offenders(log_files(args.path), args.top):
+        phases = ", ".join(
+            f"{phase} {duration * 1000:.1f}ms"
+            for phase, duration in stats["worst"]["phases"].items()
+        )
+        print(
+            f"{stats['max'] * 1000:10.1f}ms max {stats['mean'] * 1000:10.1f}ms mean"
+            f" {stats['count']:6d}x  {stats['operation'][:60]!r}  ({phases})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+"""Per-client rate limiting measured in query cost.
+
+A :py:class:`RateLimiter` passed as the ``rate_limiter`` option of the view
+computes the static cost of the operations of each request before executing
+them, and charges it to the token bucket of the client, identified by a
+user-supplied function of the request. Buckets refill at ``rate`` cost units
+per second up to ``burst`` units. Requests the bucket cannot pay for get a
+``429`` response with a ``Retry-After`` header, and operations costing more
+than ``burst`` a ``400`` response.
+
+The cost of a field is 1, plus the cost of its selections, multiplied by the
+requested size of the lists it returns (the ``first``, ``last`` or ``limit``
+argument, or ``list_size``).
+
+Buckets are kept by a store. :py:class:`LocalStore` keeps them in the memory of
+the process. Multi-worker deployments can share them by passing a store of the
+same interface, ``consume(key, cost, rate, burst)``, returning (or resolving
+to) whether the cost was consumed and the seconds to wait before it can be.
+"""
+import math
+import time
+from collections import OrderedDict
+from inspect import isawaitable
+
+from graphql import (
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    GraphQLList,
+    GraphQLNonNull,
+    InlineFragmentNode,
+    IntValueNode,
+    OperationDefinitionNode,
+    OperationType,
+    VariableNode,
+    get_named_type,
+    parse,
+    validate,
+)
+
+from graphql.utilities import get_operation_ast
+
+from graphql_server import HttpQueryError, get_graphql_params
+
+__all__ = ["LocalStore", "RateLimiter", "query_cost"]
+
+SIZE_ARGUMENTS = ("first", "last", "limit")
+
+
+class LocalStore:
+    """Token buckets kept in process memory.
+
+    At most ``maxsize`` buckets are kept, in least recently used order. A
+    bucket idle long enough to be full again is dropped, since a missing
+    bucket is a full one. Past ``maxsize``, the least recently used buckets
+    are dropped even if they are not full.
+    """
+
+    def __init__(self, maxsize=10000, timer=time.monotonic):
+        self.maxsize = maxsize
+        self.timer = timer
+        # key -> (tokens, time of the last update)
+        self._buckets = OrderedDict()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def consume(self, key, cost, rate, burst):
+        if cost < 0:
+            raise ValueError(f"The cost cannot be negative, got {cost}.")
+        now = self.timer()
+        buckets = self._buckets
+        bucket = buckets.pop(key, None)
+        if bucket is None:
+            tokens = burst
+        else:
+            tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+
+        if tokens >= cost:
+            tokens -= cost
+            retry_after = 0.0
+        else:
+            retry_after = (cost - tokens) / rate
+        buckets[key] = (tokens, now)
+
+        # The buckets are ordered by last update, so the idle ones come first.
+        idle_since = now - burst / rate
+        while buckets:
+            oldest_key, (_, updated) = next(iter(buckets.items()))
+            if updated > idle_since and len(buckets) <= self.maxsize:
+                break
+            del buckets[oldest_key]
+        return retry_after == 0.0, retry_after
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        rate=100.0,
+        burst=1000.0,
+        identify=None,
+        store=None,
+        list_size=10,
+        size_arguments=SIZE_ARGUMENTS,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.identify = identify or _remote_address
+        self.store = LocalStore() if store is None else store
+        self.list_size = list_size
+        self.size_arguments = size_arguments
+
+    async def check(self, request, view, data):
+        """Charge the cost of the operations of ``request`` to its client.
+
+        Raises :py:class:`HttpQueryError` if the client cannot pay for them.
+        Operations that cannot be parsed or validated cost nothing here, as
+        they are rejected before execution anyway.
+        """
+        cost = self.request_cost(request, view, data)
+        if not cost:
+            return
+        if cost > self.burst:
+            raise HttpQueryError(
+                400, f"Query cost exceeds the limit of {self.burst:g}."
+            )
+        result = self.store.consume(self.identify(request), cost, self.rate, self.burst)
+        if isawaitable(result):
+            result = await result
+        allowed, retry_after = result
+        if not allowed:
+            raise HttpQueryError(
+                429,
+                f"Rate limit exceeded: query cost {cost},"
+                f" retry in {retry_after:.1f} seconds.",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+
+    def request_cost(self, request, view, data):
+        if isinstance(data, list):
+            entries, query_data = data, {}
+        else:
+            entries, query_data = [data], request.query
+        document_cache = view.get_document_cache()
+        validation_rules = view.get_validation_rules()
+        cost = 0
+        for entry in entries:
+            if not isinstance(entry, dict):
+                continue
+            try:
+                params = get_graphql_params(entry, query_data)
+            except HttpQueryError:
+                continue
+            if not params.query or not isinstance(params.query, str):
+                continue
+            try:
+                if document_cache is None:
+                    document = parse(params.query)
+                    errors = validate(view.schema, document, validation_rules)
+                else:
+                    document, errors = document_cache.get(
+                        params.query, validation_rules
+                    )
+            except GraphQLError:
+                continue
+            if not errors:
+                cost += self.operation_cost(
+                    view.schema,
+                    document,
+                    params.operation_name,
+                    params.variables,
+                    self.burst - cost,
+                )
+                if cost > self.burst:
+                    break
+        return cost
+
+    def operation_cost(
+        self, schema, document, operation_name=None, variables=None, max_cost=None
+    ):
+        """Return the cost of an operation, cached with cached documents.
+
+        Past ``max_cost``, the returned cost is only known to exceed it.
+        """
+        costs = getattr(document, "costs", None)
+        if costs is not None and operation_name in costs:
+            return costs[operation_name]
+        cost, uses_variables = query_cost(
+            schema,
+            document,
+            operation_name,
+            variables,
+            self.list_size,
+            self.size_arguments,
+            max_cost,
+        )
+        # Only the costs of existing operations are kept, so that arbitrary
+        # names sent by clients cannot grow the document.
+        if (
+            costs is not None
+            and not uses_variables
+            and (max_cost is None or cost <= max_cost)
+            and get_operation_ast(document, operation_name) is not None
+        ):
+            costs[operation_name] = cost
+        return cost
+
+
+def query_cost(
+    schema,
+    document,
+    operation_name=None,
+    variables=None,
+    list_size=10,
+    size_arguments=SIZE_ARGUMENTS,
+    max_cost=None,
+):
+    """Return the static cost of an operation of a valid document.
+
+    Also returns whether the cost depends on the variables. The walk stops as
+    soon as the cost exceeds ``max_cost``, so the returned cost is then only
+    known to exceed it.
+    """
+    operation = None
+    fragments = {}
+    for definition in document.definitions:
+        if isinstance(definition, OperationDefinitionNode):
+            if operation_name is None or (
+                definition.name and definition.name.value == operation_name
+            ):
+                operation = operation or definition
+        elif isinstance(definition, FragmentDefinitionNode):
+            fragments[definition.name.value] = definition
+    if operation is None:
+        return 0, False
+
+    if not isinstance(variables, dict):
+        variables = {}
+    defaults = {
+        definition.variable.name.value: int(definition.default_value.value)
+        for definition in operation.variable_definitions or ()
+        if isinstance(definition.default_value, IntValueNode)
+    }
+    uses_variables = False
+
+    def list_multiplier(field_node):
+        nonlocal uses_variables
+        for argument in field_node.arguments or ():
+            if argument.name.value not in size_arguments:
+                continue
+            value = argument.value
+            size = None
+            if isinstance(value, IntValueNode):
+                size = int(value.value)
+            elif isinstance(value, VariableNode):
+                uses_variables = True
+                name = value.name.value
+                size = variables[name] if name in variables else defaults.get(name)
+            # Negative sizes would make the cost negative and refill the bucket.
+            if isinstance(size, int) and not isinstance(size, bool) and size >= 0:
+                return size
+        return list_size
+
+    fragment_costs = {}
+
+    def fragment_cost(name):
+        # The type of a fragment is its type condition, so its cost does not
+        # depend on where it is spread.
+        if name not in fragment_costs:
+            fragment = fragments[name]
+            type_ = schema.get_type(fragment.type_condition.name.value)
+            fragment_costs[name] = selection_set_cost(type_, fragment.selection_set)
+        return fragment_costs[name]
+
+    def selection_set_cost(parent_type, selection_set, visited_fragments=None):
+        # Like execution, a fragment spread twice in a selection set counts once.
+        if visited_fragments is None:
+            visited_fragments = set()
+        cost = 0
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                cost += field_cost(parent_type, selection)
+            elif isinstance(selection, InlineFragmentNode):
+                type_ = parent_type
+                if selection.type_condition:
+                    type_ = schema.get_type(selection.type_condition.name.value)
+                cost += selection_set_cost(
+                    type_, selection.selection_set, visited_fragments
+                )
+            elif isinstance(selection, FragmentSpreadNode):
+                name = selection.name.value
+                if name in visited_fragments:
+                    continue
+                visited_fragments.add(name)
+                cost += fragment_cost(name)
+            # Costs only grow or get multiplied by list sizes, so a partial
+            # cost past max_cost is enough to reject the operation.
+            if max_cost is not None and cost > max_cost:
+                break
+        return cost
+
+    def field_cost(parent_type, field_node):
+        name = field_node.name.value
+        field = getattr(parent_type, "fields", {}).get(name)
+        if field is None:  # __typename and the introspection fields
+            return 0
+        cost = 1
+        if field_node.selection_set:
+            cost += selection_set_cost(
+                get_named_type(field.type), field_node.selection_set
+            )
+        # The size arguments apply to the outer list, nested lists get list_size.
+        type_ = field.type
+        multiplier = 1
+        sized = False
+        while isinstance(type_, (GraphQLNonNull, GraphQLList)):
+            if isinstance(type_, GraphQLList):
+                multiplier *= list_size if sized else list_multiplier(field_node)
+                sized = True
+            type_ = type_.of_type
+        return cost * multiplier
+
+    root_type = {
+        OperationType.QUERY: schema.query_type,
+        OperationType.MUTATION: schema.mutation_type,
+        OperationType.SUBSCRIPTION: schema.subscription_type,
+    }[operation.operation]
+    return selection_set_cost(root_type, operation.selection_set), uses_variables
+
+
+def _remote_address(request):
+    return request.remote
@@ -0,0 +1,217 @@
+"""Pre-fork serving helper for applications exposing a :py:class:`GraphQLView`.
+
+The parent process builds the application, warms the schemas of every attached
+view and binds one listening socket. It then forks the workers, which inherit
+the socket and the warmed objects copy-on-write, and supervises them until they
+exit.
+"""
+import gc
+import json
+import os
+import signal
+import socket
+import time
+import traceback
+from multiprocessing.sharedctypes import RawArray
+
+from aiohttp import web
+from graphql import get_introspection_query, graphql_sync, parse, validate
+from graphql.type import validate_schema
+
+from .graphqlview import find_views
+
+
+class WorkerMetrics:
+    """Per-worker request counters kept in memory shared by all the workers.
+
+    The counters are allocated before forking, each worker only writes to its
+    own slot, so no locking is needed and any process can read an aggregated
+    snapshot.
+    """
+
+    fields = ("requests", "errors", "latency_total", "latency_max")
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.index = 0
+        self._values = RawArray("d", workers * len(self.fields))
+
+    def record(self, latency, status):
+        offset = self.index * len(self.fields)
+        values = self._values
+        values[offset] += 1
+        if status >= 400:
+            values[offset + 1] += 1
+        values[offset + 2] += latency
+        if latency > values[offset + 3]:
+            values[offset + 3] = latency
+
+    def worker(self, index):
+        end = (index + 1) * len(self.fields)
+        requests, errors, latency_total, latency_max = self._values[
+            end - len(self.fields):end
+        ]
+        return {
+            "worker": index,
+            "requests": int(requests),
+            "errors": int(errors),
+            "latency_avg": latency_total / requests if requests else 0.0,
+            "latency_max": latency_max,
+        }
+
+    def snapshot(self):
+        workers = [self.worker(index) for index in range(self.workers)]
+        requests = sum(worker["requests"] for worker in workers)
+        latency_total = sum(
+            worker["latency_avg"] * worker["requests"] for worker in workers
+        )
+        return {
+            "workers": workers,
+            "total": {
+                "requests": requests,
+                "errors": sum(worker["errors"] for worker in workers),
+                "latency_avg": latency_total / requests if requests else 0.0,
+                "latency_max": max(
+                    (worker["latency_max"] for worker in workers), default=0.0
+                ),
+            },
+        }
+
+    def middleware(self):
+        metrics = self
+
+        @web.middleware
+        async def metrics_middleware(request, handler):
+            start = time.perf_counter()
+            status = 500
+            try:
+                response = await handler(request)
+                status = response.status
+                return response
+            except web.HTTPException as err:
+                status = err.status
+                raise
+            finally:
+                metrics.record(time.perf_counter() - start, status)
+
+        return metrics_middleware
+
+    async def handler(self, request):
+        return web.Response(
+            text=json.dumps(self.snapshot()), content_type="application/json"
+        )
+
+
+def warm_app(app, queries=()):
+    """Build the lazily computed parts of every schema attached to ``app``.
+
+    The schemas are validated and introspected once, which resolves all the
+    field thunks, and the given queries are parsed and validated against each
+    schema (into the document cache of the view, if enabled), so this work is
+    not repeated in every worker.
+    """
+    introspection_query = get_introspection_query(descriptions=True)
+    for view in find_views(app):
+        errors = validate_schema(view.schema)
+        if errors:
+            raise TypeError(f"Invalid schema attached to {view!r}: {errors[0]}")
+        graphql_sync(view.schema, introspection_query)
+        document_cache = view.get_document_cache()
+        for query in queries:
+            if document_cache is None:
+                document = parse(query)
+                errors = validate(view.schema, document, view.get_validation_rules())
+            else:
+                errors = document_cache.get(query, view.get_validation_rules())[1]
+            if errors:
+                raise ValueError(f"Invalid warm-up query {query!r}: {errors[0]}")
+
+
+def create_socket(host="0.0.0.0", port=8080, backlog=128):
+    """Bind the listening socket that is shared by all the workers."""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if hasattr(socket, "SO_REUSEPORT"):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_app(
+    app,
+    *,
+    workers=None,
+    host="0.0.0.0",
+    port=8080,
+    backlog=128,
+    warm_queries=(),
+    metrics_path=None,
+    **kwargs,
+):
+    """Serve ``app`` from ``workers`` forked processes sharing one socket.
+
+    ``workers`` defaults to the number of CPUs. ``warm_queries`` are parsed and
+    validated in the parent before forking. If ``metrics_path`` is set, a route
+    returning the metrics aggregated over all the workers is added to the app.
+    All other keyword arguments are passed on to :py:func:`aiohttp.web.run_app`.
+    """
+    workers = workers or os.cpu_count() or 1
+    metrics = WorkerMetrics(workers)
+    app.middlewares.append(metrics.middleware())
+    if metrics_path:
+        app.router.add_get(metrics_path, metrics.handler)
+
+    warm_app(app, warm_queries)
+    sock = create_socket(host, port, backlog)
+    kwargs.setdefault("print", None)
+
+    if hasattr(gc, "freeze"):
+        # Keep the warmed objects out of the collector so that it does not
+        # touch (and copy) their pages in the workers.
+        gc.collect()
+        gc.freeze()
+
+    pids = []
+    for index in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                metrics.index = index
+                web.run_app(app, sock=sock, **kwargs)
+            except BaseException:
+                code = 1
+                traceback.print_exc()
+            finally:
+                os._exit(code)
+        pids.append(pid)
+
+    def forward(signum, _frame):
+        for pid in pids:
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    previous = {
+        signum: signal.signal(signum, forward)
+        for signum in (signal.SIGINT, signal.SIGTERM)
+    }
+    try:
+        for pid in pids:
+            while True:
+                try:
+                    os.waitpid(pid, 0)
+                    break
+                except InterruptedError:
+                    continue
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+        sock.close()
+        if hasattr(gc, "unfreeze"):
+            gc.unfreeze()
+    return metrics
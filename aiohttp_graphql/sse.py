@@ -0,0 +1,343 @@
+"""Server-Sent Events transport following the graphql-sse protocol.
+
+In the distinct connections mode, a request accepting ``text/event-stream``
+streams the results of its operation as ``next`` events, followed by one
+``complete`` event.
+
+In the single connection mode, a ``PUT`` request reserves a stream and returns
+its token, a ``GET`` request carrying the token opens the stream, ``POST``
+requests carrying the token and an ``operationId`` extension start operations
+whose results are multiplexed on the stream, and ``DELETE`` requests carrying
+the token and an ``operationId`` query parameter stop them.
+
+Every event has an id, and a client reconnecting with ``Last-Event-ID`` gets the
+events it missed that are still buffered. Comment lines are sent as heartbeats
+while a stream is idle.
+"""
+import asyncio
+import secrets
+from collections import deque
+from contextlib import AsyncExitStack
+from inspect import isawaitable
+
+from aiohttp import web
+from graphql import GraphQLError, execute, parse, subscribe, validate
+from graphql.language import OperationType
+from graphql.utilities import get_operation_ast
+
+from graphql_server import (
+    HttpQueryError,
+    format_execution_result,
+    load_json_body,
+    load_json_variables,
+)
+
+TOKEN_HEADER = "X-GraphQL-Event-Stream-Token"
+EVENT_STREAM = "text/event-stream"
+
+
+def is_sse_request(request):
+    return (
+        request.method == "PUT"
+        or TOKEN_HEADER in request.headers
+        or "token" in request.query
+        or EVENT_STREAM in request.headers.get("accept", "")
+    )
+
+
+class ValidationFailed(Exception):
+    """Raised when the operation sent to an event stream is invalid."""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+class EventStream:
+    """Events of one stream, kept so that a reconnecting client can resume."""
+
+    def __init__(self, buffer_size):
+        self.events = deque(maxlen=buffer_size)
+        self.last_id = 0
+        self.operations = {}
+        self.connections = 0
+        self.changed = asyncio.Event()
+        self.expiry = None
+
+    def push(self, event, data):
+        self.last_id += 1
+        self.events.append(
+            (self.last_id, f"id: {self.last_id}\nevent: {event}\ndata: {data}\n\n")
+        )
+        self.changed.set()
+
+    async def write_to(self, response, last_event_id, heartbeat, until_idle=False):
+        """Write the events following ``last_event_id`` to ``response``.
+
+        With ``until_idle``, the events are dropped once written (they cannot
+        be resumed anyway) and this returns when all the operations are done.
+        """
+        sent = last_event_id
+        while True:
+            self.changed.clear()
+            for event_id, text in list(self.events):
+                if event_id > sent:
+                    await response.write(text.encode())
+                    sent = event_id
+                if until_idle:
+                    self.events.popleft()
+            if until_idle:
+                # Events pushed while writing are written before returning.
+                if self.events:
+                    continue
+                if not self.operations:
+                    return
+            try:
+                await asyncio.wait_for(self.changed.wait(), heartbeat)
+            except asyncio.TimeoutError:
+                await response.write(b":\n\n")
+
+    def cancel(self):
+        for task in self.operations.values():
+            task.cancel()
+        self.operations.clear()
+
+
+class SSEHandler:
+    """Serve the graphql-sse protocol for a :py:class:`GraphQLView`."""
+
+    def __init__(self, view):
+        self.view = view
+        self.streams = {}
+
+    async def __call__(self, request):
+        try:
+            if request.method == "PUT":
+                return self.reserve()
+            token = request.headers.get(TOKEN_HEADER) or request.query.get("token")
+            if token is None:
+                return await self.distinct_connection(request)
+            stream = self.streams.get(token)
+            if stream is None:
+                raise HttpQueryError(404, "Stream not found.")
+            if request.method == "GET" and EVENT_STREAM in request.headers.get(
+                "accept", ""
+            ):
+                return await self.open_stream(request, stream, token)
+            if request.method == "POST":
+                return await self.start_operation(request, stream)
+            if request.method == "DELETE":
+                return self.stop_operation(request, stream)
+            raise HttpQueryError(405, "Unsupported method for an event stream.")
+        except HttpQueryError as err:
+            return self.error_response(
+                [GraphQLError(err.message)], err.status_code, err.headers
+            )
+        except ValidationFailed as err:
+            return self.error_response(err.errors, 400)
+
+    def error_response(self, errors, status, headers=None):
+        return web.Response(
+            body=self.view.encode(
+                dict(errors=[self.view.format_error(error) for error in errors])
+            ),
+            status=status,
+            headers=headers,
+            content_type="application/json",
+        )
+
+    def reserve(self):
+        token = secrets.token_urlsafe(16)
+        self.streams[token] = stream = EventStream(self.view.sse_buffer_size)
+        self.expire_later(token, stream)
+        return web.Response(status=201, text=token)
+
+    def expire_later(self, token, stream):
+        def expire():
+            if stream.connections == 0 and self.streams.get(token) is stream:
+                del self.streams[token]
+                stream.cancel()
+
+        if stream.expiry is not None:
+            stream.expiry.cancel()
+        stream.expiry = asyncio.get_event_loop().call_later(
+            self.view.sse_retention, expire
+        )
+
+    async def prepare(self, request):
+        response = web.StreamResponse(
+            headers={
+                "Content-Type": EVENT_STREAM,
+                "Cache-Control": "no-cache",
+                "X-Accel-Buffering": "no",
+            }
+        )
+        await response.prepare(request)
+        return response
+
+    async def open_stream(self, request, stream, token):
+        try:
+            last_event_id = int(request.headers.get("Last-Event-ID") or 0)
+        except ValueError:
+            raise HttpQueryError(400, "Invalid Last-Event-ID header.")
+        if stream.connections:
+            raise HttpQueryError(409, "Stream already open.")
+        stream.connections += 1
+        response = await self.prepare(request)
+        try:
+            await stream.write_to(response, last_event_id, self.view.sse_heartbeat)
+        except ConnectionResetError:
+            pass
+        finally:
+            stream.connections -= 1
+            self.expire_later(token, stream)
+        return response
+
+    async def distinct_connection(self, request):
+        if request.method == "GET":
+            data = dict(request.query)
+        else:
+            data = load_json_body(await request.text())
+        document, params = self.get_operation(request, data)
+        if self.view.rate_limiter is not None:
+            await self.view.rate_limiter.check(request, self.view, data)
+        resources = await self.enter_resources(request, params)
+        stream = EventStream(None)
+        task = self.run(stream, None, document, params, resources)
+        response = await self.prepare(request)
+        try:
+            await stream.write_to(
+                response, 0, self.view.sse_heartbeat, until_idle=True
+            )
+        finally:
+            task.cancel()
+        return response
+
+    async def start_operation(self, request, stream):
+        data = load_json_body(await request.text())
+        if not isinstance(data, dict):
+            raise HttpQueryError(400, "GraphQL params should be a dict.")
+        extensions = data.get("extensions") or {}
+        if not isinstance(extensions, dict):
+            raise HttpQueryError(400, "Extensions should be a dict.")
+        operation_id = extensions.get("operationId")
+        if not operation_id:
+            raise HttpQueryError(400, "Operation ID is missing.")
+        if operation_id in stream.operations:
+            raise HttpQueryError(
+                409, f"Operation with ID {operation_id} already exists."
+            )
+        document, params = self.get_operation(request, data)
+        if self.view.rate_limiter is not None:
+            await self.view.rate_limiter.check(request, self.view, data)
+        resources = await self.enter_resources(request, params)
+        self.run(stream, operation_id, document, params, resources)
+        return web.Response(status=202)
+
+    def stop_operation(self, request, stream):
+        operation_id = request.query.get("operationId")
+        if not operation_id:
+            raise HttpQueryError(400, "Operation ID is missing.")
+        task = stream.operations.pop(operation_id, None)
+        if task is not None:
+            task.cancel()
+            stream.push("complete", self.view.encode({"id": operation_id}))
+        return web.Response(status=200)
+
+    def get_operation(self, request, data):
+        if not isinstance(data, dict):
+            raise HttpQueryError(400, "GraphQL params should be a dict.")
+        query = data.get("query")
+        if not query or not isinstance(query, str):
+            raise HttpQueryError(400, "Must provide query string.")
+        try:
+            document = parse(query)
+        except GraphQLError as error:
+            raise ValidationFailed([error])
+        operation_name = data.get("operationName")
+        operation = get_operation_ast(document, operation_name)
+        if operation is None:
+            raise HttpQueryError(400, "Could not determine the operation to run.")
+        if request.method == "GET" and operation.operation == OperationType.MUTATION:
+            raise HttpQueryError(
+                405,
+                "Can only perform a mutation operation from a POST request.",
+                headers={"Allow": "POST"},
+            )
+        errors = validate(self.view.schema, document, self.view.get_validation_rules())
+        if errors:
+            raise ValidationFailed(errors)
+        params = dict(
+            variable_values=load_json_variables(data.get("variables")),
+            operation_name=operation_name,
+            is_subscription=operation.operation == OperationType.SUBSCRIPTION,
+        )
+        return document, params
+
+    async def enter_resources(self, request, params):
+        """Add the root and context values of an operation to its ``params``.
+
+        Returns the stack of the resources entered by the factories of the
+        view, which lives as long as the operation.
+        """
+        resources = AsyncExitStack()
+        try:
+            params["root_value"], params["context_value"] = (
+                await self.view.get_execution_values(request, resources)
+            )
+        except BaseException:
+            await resources.aclose()
+            raise
+        return resources
+
+    def run(self, stream, operation_id, document, params, resources):
+        task = asyncio.ensure_future(
+            self.run_operation(stream, operation_id, document, resources, **params)
+        )
+        # An operation cancelled before it starts never enters its resources.
+        task.add_done_callback(lambda _: asyncio.ensure_future(resources.aclose()))
+        stream.operations[operation_id] = task
+        return task
+
+    async def run_operation(
+        self, stream, operation_id, document, resources, is_subscription, **params
+    ):
+        def push(event, result=None):
+            if operation_id is None:
+                payload = result
+            elif result is None:
+                payload = {"id": operation_id}
+            else:
+                payload = {"id": operation_id, "payload": result}
+            stream.push(event, "" if payload is None else self.view.encode(payload))
+
+        try:
+            async with resources:
+                if is_subscription:
+                    results = await subscribe(self.view.schema, document, **params)
+                    if hasattr(results, "__aiter__"):
+                        try:
+                            async for result in results:
+                                push("next", self.format(result))
+                        finally:
+                            await results.aclose()
+                    else:
+                        push("next", self.format(results))
+                else:
+                    result = execute(
+                        self.view.schema,
+                        document,
+                        middleware=self.view.get_middleware(),
+                        **params,
+                    )
+                    if isawaitable(result):
+                        result = await result
+                    push("next", self.format(result))
+            push("complete")
+        finally:
+            if stream.operations.get(operation_id) is asyncio.current_task():
+                del stream.operations[operation_id]
+            stream.changed.set()
+
+    def format(self, result):
+        return format_execution_result(result, self.view.format_error).result
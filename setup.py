@@ -35,12 +35,12 @@ setup(
         "Development Status :: 5 - Production/Stable",
         "Intended Audience :: Developers",
         "Topic :: Software Development :: Libraries",
-        "Programming Language :: Python :: 3.6",
         "Programming Language :: Python :: 3.7",
         "Programming Language :: Python :: 3.8",
         "License :: OSI Approved :: MIT License",
     ],
     keywords="api graphql protocol aiohttp",
+    python_requires=">=3.7",
     packages=find_packages(exclude=["tests"]),
     install_requires=install_requires,
     tests_require=tests_requires,
@@ -0,0 +1,254 @@
+"""Local load-test harness for the GraphQL view stack.
+
+Serves :py:func:`tests.app.create_app` (with the async schema on a second route)
+from a separate process, sends it an open-loop mix of queries and reports the
+latency distribution and the event loop lag of the server::
+
+    python -m tests.loadtest --rate 500 --duration 10 --concurrency 100
+    python -m tests.loadtest --save-baseline tests/loadtest_baseline.json
+    python -m tests.loadtest --baseline tests/loadtest_baseline.json --tolerance 0.2
+
+With ``--baseline``, the run fails if a metric exceeds its baseline value by
+more than the tolerance. Arrivals follow a seeded Poisson process and latencies
+are measured from the scheduled send time, so that a saturated server is not
+hidden by the client waiting for it.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import socket
+import sys
+from urllib.parse import urlencode
+
+import aiohttp
+from aiohttp import web
+
+from aiohttp_graphql import GraphQLView
+from tests.app import create_app
+from tests.schema import AsyncSchema
+
+MIX = {
+    "test": ("/graphql", "{test}", 4),
+    "test_who": ("/graphql", 'query { test(who: "Dolly") }', 2),
+    "context": ("/graphql", "{context { request }}", 1),
+    "async": ("/graphql/async", "{a,b,c}", 2),
+}
+
+COMPARED_METRICS = (
+    ("latency", "p50"),
+    ("latency", "p99"),
+    ("loop_lag", "p99"),
+)
+
+
+class LoopLagMonitor:
+    """Sample how late the event loop wakes up a sleeping task."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.trace = []
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._sample())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    async def _sample(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.trace.append((start, loop.time() - start - self.interval))
+
+
+def create_loadtest_app():
+    app = create_app()
+    GraphQLView.attach(
+        app,
+        schema=AsyncSchema,
+        enable_async=True,
+        route_path="/graphql/async",
+        route_name="async_graphql",
+    )
+    monitor = LoopLagMonitor()
+
+    async def start_monitor(_app):
+        monitor.start()
+
+    async def lag(_request):
+        trace, monitor.trace = monitor.trace, []
+        return web.json_response([delay for _, delay in trace])
+
+    app.on_startup.append(start_monitor)
+    app.router.add_get("/loadtest/lag", lag)
+    return app
+
+
+def serve(sock):
+    web.run_app(create_loadtest_app(), sock=sock, print=None)
+
+
+def percentiles(samples):
+    if not samples:
+        return {"count": 0, "p50": 0.0, "p90": 0.0, "p99": 0.0, "max": 0.0}
+    ordered = sorted(samples)
+
+    def percentile(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    return {
+        "count": len(ordered),
+        "p50": percentile(0.5),
+        "p90": percentile(0.9),
+        "p99": percentile(0.99),
+        "max": ordered[-1],
+    }
+
+
+async def generate_load(
+    session, base_url, mix=None, rate=200, duration=5.0, concurrency=50, seed=0
+):
+    """Send an open-loop stream of requests, returning (name, latency, status)."""
+    mix = MIX if mix is None else mix
+    rng = random.Random(seed)
+    names = list(mix)
+    weights = [mix[name][2] for name in names]
+    semaphore = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_event_loop()
+    samples = []
+
+    async def send(name, scheduled):
+        path, query, _ = mix[name]
+        async with semaphore:
+            try:
+                async with session.get(
+                    f"{base_url}{path}?{urlencode({'query': query})}"
+                ) as response:
+                    await response.read()
+                    status = response.status
+            except aiohttp.ClientError:
+                status = 0
+        samples.append((name, loop.time() - scheduled, status))
+
+    tasks = []
+    start = loop.time()
+    scheduled = start
+    while True:
+        scheduled += rng.expovariate(rate)
+        if scheduled - start > duration:
+            break
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        name = rng.choices(names, weights)[0]
+        tasks.append(asyncio.ensure_future(send(name, scheduled)))
+    await asyncio.gather(*tasks)
+    return samples
+
+
+def summarize(samples, lag, duration):
+    by_name = {}
+    for name, latency, _ in samples:
+        by_name.setdefault(name, []).append(latency)
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for _, _, status in samples if status != 200),
+        "throughput": len(samples) / duration if duration else 0.0,
+        "latency": percentiles([latency for _, latency, _ in samples]),
+        "queries": {name: percentiles(latencies) for name, latencies in by_name.items()},
+        "loop_lag": percentiles(lag),
+    }
+
+
+def compare(report, baseline, tolerance):
+    """Return the metrics of ``report`` exceeding ``baseline`` by over ``tolerance``."""
+    regressions = []
+    if report["errors"] > baseline.get("errors", 0):
+        regressions.append(f"errors: {report['errors']} > {baseline.get('errors', 0)}")
+    for section, metric in COMPARED_METRICS:
+        limit = baseline[section][metric] * (1 + tolerance)
+        value = report[section][metric]
+        if value > limit:
+            regressions.append(
+                f"{section} {metric}: {value * 1000:.2f}ms > {limit * 1000:.2f}ms"
+            )
+    return regressions
+
+
+async def run(base_url, rate, duration, concurrency, seed):
+    async with aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=concurrency)
+    ) as session:
+        for _ in range(50):
+            try:
+                async with session.get(f"{base_url}/loadtest/lag") as response:
+                    await response.read()
+                break
+            except aiohttp.ClientError:
+                await asyncio.sleep(0.1)
+        else:
+            raise RuntimeError(f"The server at {base_url} did not start.")
+        samples = await generate_load(
+            session,
+            base_url,
+            rate=rate,
+            duration=duration,
+            concurrency=concurrency,
+            seed=seed,
+        )
+        async with session.get(f"{base_url}/loadtest/lag") as response:
+            lag = await response.json()
+    return summarize(samples, lag, duration)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rate", type=float, default=200, help="requests/second")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", help="fail on regressions against this file")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--save-baseline", help="write the report to this file")
+    args = parser.parse_args(argv)
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(args.concurrency)
+    server = multiprocessing.Process(target=serve, args=(sock,), daemon=True)
+    server.start()
+    try:
+        base_url = "http://127.0.0.1:%d" % sock.getsockname()[1]
+        loop = asyncio.new_event_loop()
+        report = loop.run_until_complete(
+            run(base_url, args.rate, args.duration, args.concurrency, args.seed)
+        )
+        loop.close()
+    finally:
+        server.terminate()
+        server.join()
+        sock.close()
+
+    print(json.dumps(report, indent=2))
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as baseline_file:
+            json.dump(report, baseline_file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(report, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
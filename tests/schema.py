@@ -2,7 +2,7 @@ import asyncio
 
 from graphql.type.definition import (GraphQLArgument, GraphQLField,
                                      GraphQLNonNull, GraphQLObjectType)
-from graphql.type.scalars import GraphQLString
+from graphql.type.scalars import GraphQLInt, GraphQLString
 from graphql.type.schema import GraphQLSchema
 
 
@@ -88,3 +88,26 @@ AsyncQueryType = GraphQLObjectType(
 
 
 AsyncSchema = GraphQLSchema(AsyncQueryType)
+
+
+# Schema with subscriptions
+async def subscribe_countdown(_obj, info, start):
+    for value in range(start, -1, -1):
+        await asyncio.sleep(0.001)
+        yield value
+
+
+SubscriptionType = GraphQLObjectType(
+    "SubscriptionType",
+    {
+        "countdown": GraphQLField(
+            GraphQLInt,
+            args={"start": GraphQLArgument(GraphQLNonNull(GraphQLInt))},
+            subscribe=subscribe_countdown,
+            resolve=lambda value, info, start: value,
+        ),
+    },
+)
+
+
+SubscriptionSchema = GraphQLSchema(AsyncQueryType, subscription=SubscriptionType)
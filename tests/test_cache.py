@@ -0,0 +1,262 @@
+import asyncio
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+from graphql import build_schema, graphql, graphql_sync
+
+from aiohttp_graphql.cache import LRUBackend, ResolverCache
+
+from .app import create_app, url_string
+from .schema import Schema
+
+
+class Timer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_backend_expires_entries():
+    timer = Timer()
+    backend = LRUBackend(timer=timer)
+    backend.set("key", "value", ttl=10)
+
+    assert backend.get("key") == "value"
+    timer.now = 10
+    assert backend.get("key") is None
+    assert len(backend) == 0
+
+
+def test_lru_backend_evicts_least_recently_used():
+    backend = LRUBackend(maxsize=2)
+    backend.set("a", 1)
+    backend.set("b", 2)
+    backend.get("a")
+    backend.set("c", 3)
+
+    assert backend.get("a") == 1
+    assert backend.get("b") is None
+    assert backend.get("c") == 3
+
+
+def make_schema(cache, calls):
+    schema = build_schema(
+        """
+        directive @cached(ttl: Int, tags: [String!]) on FIELD_DEFINITION
+
+        type Query {
+          flag(name: String!): Boolean @cached(ttl: 60, tags: ["flags"])
+          now: Int
+        }
+        """
+    )
+
+    def resolve_flag(_root, _info, name):
+        calls.append(name)
+        return name == "on"
+
+    schema.query_type.fields["flag"].resolve = resolve_flag
+    return cache.apply_directives(schema)
+
+
+def test_directive_caches_per_arguments():
+    cache = ResolverCache()
+    calls = []
+    schema = make_schema(cache, calls)
+
+    for _ in range(3):
+        result = graphql_sync(schema, '{ on: flag(name: "on"), off: flag(name: "x") }')
+        assert result.data == {"on": True, "off": False}
+
+    assert calls == ["on", "x"]
+    assert cache.stats() == {
+        "Query.flag": {"hits": 4, "misses": 2, "hit_rate": 4 / 6},
+    }
+
+
+def test_directive_applies_to_extension_fields():
+    calls = []
+    schema = build_schema(
+        """
+        directive @cached(ttl: Int, tags: [String!]) on FIELD_DEFINITION
+
+        type Query { now: Int }
+
+        extend type Query { greeting: String @cached(ttl: 5) }
+        """
+    )
+    schema.query_type.fields["greeting"].resolve = lambda *_: calls.append("hi")
+    ResolverCache().apply_directives(schema)
+
+    for _ in range(2):
+        graphql_sync(schema, "{ greeting }")
+    assert calls == ["hi"]
+
+
+def test_directives_skip_fields_defined_in_code():
+    schema = ResolverCache().apply_directives(Schema)
+
+    assert graphql_sync(schema, "{ test }").data == {"test": "Hello World"}
+
+
+def test_invalidate_by_tag():
+    cache = ResolverCache()
+    calls = []
+    schema = make_schema(cache, calls)
+
+    graphql_sync(schema, '{ flag(name: "on") }')
+    cache.invalidate("flags")
+    graphql_sync(schema, '{ flag(name: "on") }')
+    cache.invalidate("other")
+    graphql_sync(schema, '{ flag(name: "on") }')
+
+    assert calls == ["on", "on"]
+
+
+def test_decorator_caches_per_parent_and_dynamic_tags():
+    cache = ResolverCache()
+    calls = []
+    schema = build_schema(
+        "type Query { user: User } type User { id: Int name: String }"
+    )
+
+    @cache.cached(ttl=60, tags=lambda parent, _args: [f"user:{parent['id']}"])
+    def resolve_name(parent, _info):
+        calls.append(parent["id"])
+        return f"user {parent['id']}"
+
+    schema.query_type.fields["user"].resolve = lambda _root, _info: {"id": 1}
+    schema.type_map["User"].fields["name"].resolve = resolve_name
+
+    graphql_sync(schema, "{ user { name } }")
+    graphql_sync(schema, "{ user { name } }")
+    cache.invalidate("user:2")
+    graphql_sync(schema, "{ user { name } }")
+    cache.invalidate("user:1")
+    result = graphql_sync(schema, "{ user { name } }")
+
+    assert result.data == {"user": {"name": "user 1"}}
+    assert calls == [1, 1]
+
+
+def test_unhashable_parents_are_not_cached():
+    cache = ResolverCache()
+    schema = build_schema(
+        "type Query { user(name: String): User } type User { greeting: String }"
+    )
+
+    class User:
+        __hash__ = None
+
+        def __init__(self, name):
+            self.name = name
+
+    @cache.cached(ttl=60)
+    def resolve_greeting(parent, _info):
+        return f"hi {parent.name}"
+
+    schema.query_type.fields["user"].resolve = lambda _root, _info, name: User(name)
+    schema.type_map["User"].fields["greeting"].resolve = resolve_greeting
+
+    for name in ("bob", "carol", "bob"):
+        result = graphql_sync(schema, f'{{ user(name: "{name}") {{ greeting }} }}')
+        assert result.data == {"user": {"greeting": f"hi {name}"}}
+    assert len(cache.backend) == 0
+    assert cache.stats()["User.greeting"]["misses"] == 3
+
+
+def test_tags_of_evicted_entries_are_forgotten():
+    cache = ResolverCache(backend=LRUBackend(maxsize=2))
+
+    @cache.cached(ttl=60, tags=lambda _parent, args: ["t", f"n:{args['n']}"])
+    def resolve(_parent, _info, n):
+        return n
+
+    for n in range(1000):
+        resolve(None, Info(), n=n)
+
+    assert len(cache.backend) == 2
+    assert cache._tags == {
+        "t": {key(998), key(999)},
+        "n:998": {key(998)},
+        "n:999": {key(999)},
+    }
+
+    cache.invalidate("n:999")
+    assert cache._tags == {"t": {key(998)}, "n:998": {key(998)}}
+    assert cache._key_tags.keys() == {key(998)}
+
+
+def test_tags_of_expired_entries_are_forgotten():
+    timer = Timer()
+    cache = ResolverCache(backend=LRUBackend(timer=timer))
+
+    @cache.cached(ttl=10, tags=["t"])
+    def resolve(_parent, _info):
+        return 1
+
+    resolve(None, Info())
+    assert cache._tags == {"t": {key()}}
+    timer.now = 10
+
+    assert cache.backend.get(key()) is None
+    assert cache._tags == {}
+    assert cache._key_tags == {}
+
+
+class Info:
+    parent_type = type("Type", (), {"name": "Query"})
+    field_name = "field"
+
+
+def key(n=None):
+    return ("Query.field", None, () if n is None else (("n", n),))
+
+
+@pytest.mark.asyncio
+async def test_caches_async_resolvers():
+    cache = ResolverCache()
+    calls = []
+    schema = build_schema("type Query { slow: String }")
+
+    @cache.cached(ttl=60)
+    async def resolve_slow(_root, _info):
+        calls.append(None)
+        await asyncio.sleep(0.001)
+        return "done"
+
+    schema.query_type.fields["slow"].resolve = resolve_slow
+
+    assert (await graphql(schema, "{ slow }")).data == {"slow": "done"}
+    assert (await graphql(schema, "{ slow }")).data == {"slow": "done"}
+    assert len(calls) == 1
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def app(calls):
+    app = create_app(schema=make_schema(ResolverCache(), calls))
+    return app
+
+
+@pytest.fixture
+async def client(app):
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    yield client
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_cached_fields_through_view(client, calls):
+    for _ in range(2):
+        response = await client.get(url_string(query='{ flag(name: "on") }'))
+        assert await response.json() == {"data": {"flag": True}}
+
+    assert calls == ["on"]
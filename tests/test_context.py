@@ -0,0 +1,218 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+from graphql import build_schema
+
+from aiohttp_graphql import GraphQLView
+from graphql_server import HttpQueryError
+
+schema = build_schema(
+    """
+    type Query {
+      connection: Int
+      slowConnection: Int
+      root: String
+    }
+    """
+)
+
+
+def resolve_connection(_root, info):
+    return info.context["connection"]
+
+
+async def resolve_slow_connection(_root, info):
+    await asyncio.sleep(0.01)
+    return info.context["connection"]
+
+
+schema.query_type.fields["connection"].resolve = resolve_connection
+schema.query_type.fields["slowConnection"].resolve = resolve_slow_connection
+schema.query_type.fields["root"].resolve = lambda root, _info: root
+
+
+class Pool:
+    """Hands out numbered connections, recording their releases."""
+
+    def __init__(self):
+        self.checked_out = 0
+        self.released = []
+        self.all_released = asyncio.Event()
+
+    @asynccontextmanager
+    async def acquire(self):
+        self.checked_out += 1
+        connection = self.checked_out
+        try:
+            yield connection
+        finally:
+            self.released.append(connection)
+            if len(self.released) == self.checked_out:
+                self.all_released.set()
+
+
+@pytest.fixture
+def pool():
+    return Pool()
+
+
+@pytest.fixture
+async def client(pool):
+    @asynccontextmanager
+    async def context_factory(request):
+        async with pool.acquire() as connection:
+            yield {"request": request, "connection": connection}
+
+    async def root_value_factory(request):
+        return request.query.get("root", "root")
+
+    app = web.Application()
+    GraphQLView.attach(
+        app,
+        schema=schema,
+        batch=True,
+        enable_async=True,
+        context_factory=context_factory,
+        root_value_factory=root_value_factory,
+    )
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    yield client
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_context_factory_sets_up_each_request(client, pool):
+    for connection in (1, 2):
+        response = await client.get("/graphql?query={connection,root}&root=value")
+
+        assert response.status == 200
+        assert await response.json() == {
+            "data": {"connection": connection, "root": "value"}
+        }
+        await asyncio.wait_for(pool.all_released.wait(), 1)
+        assert pool.released == list(range(1, connection + 1))
+
+
+@pytest.mark.asyncio
+async def test_context_factory_is_shared_by_the_batch(client, pool):
+    response = await client.post(
+        "/graphql",
+        json=[{"query": "{slowConnection}"}, {"query": "{connection}"}],
+    )
+
+    assert await response.json() == [
+        {"data": {"slowConnection": 1}},
+        {"data": {"connection": 1}},
+    ]
+    await asyncio.wait_for(pool.all_released.wait(), 1)
+    assert pool.checked_out == 1
+
+
+@pytest.mark.asyncio
+async def test_resources_are_released_after_the_response_is_written(pool):
+    written = []
+
+    @asynccontextmanager
+    async def context_factory(request):
+        async with pool.acquire() as connection:
+            yield {"connection": connection}
+        written.append(request.writer.output_size)
+
+    app = web.Application()
+    GraphQLView.attach(app, schema=schema, context_factory=context_factory)
+    async with TestClient(TestServer(app)) as client:
+        response = await client.get("/graphql?query={connection}")
+        body = await response.read()
+
+    assert pool.released == [1]
+    assert written and written[0] >= len(body)
+
+
+@pytest.mark.asyncio
+async def test_context_factory_errors_are_reported(pool):
+    def context_factory(request):
+        raise HttpQueryError(401, "Not authenticated.")
+
+    app = web.Application()
+    GraphQLView.attach(app, schema=schema, context_factory=context_factory)
+    async with TestClient(TestServer(app)) as client:
+        response = await client.get("/graphql?query={connection}")
+
+        assert response.status == 401
+        assert await response.json() == {
+            "errors": [
+                {"message": "Not authenticated.", "locations": None, "path": None}
+            ]
+        }
+
+
+@pytest.mark.asyncio
+async def test_context_factory_sees_errors_on_teardown(pool):
+    errors = []
+
+    @asynccontextmanager
+    async def context_factory(request):
+        try:
+            yield {}
+        except Exception as error:
+            errors.append(error)
+            raise
+
+    async def fail(*_args):
+        raise RuntimeError("Encoding failed.")
+
+    app = web.Application()
+    view = GraphQLView.attach(
+        app,
+        schema=schema,
+        batch=True,
+        batch_stream=True,
+        context_factory=context_factory,
+    )
+    view.stream_batch = fail
+    async with TestClient(TestServer(app)) as client:
+        response = await client.post(
+            "/graphql",
+            json=[{"query": "{root}"}],
+            headers={"Accept": "application/x-ndjson"},
+        )
+        assert response.status == 500
+
+    assert [str(error) for error in errors] == ["Encoding failed."]
+
+
+@pytest.mark.asyncio
+async def test_factories_apply_to_event_streams(pool):
+    @asynccontextmanager
+    async def context_factory(request):
+        if "Authorization" not in request.headers:
+            raise HttpQueryError(401, "Not authenticated.")
+        async with pool.acquire() as connection:
+            yield {"connection": connection}
+
+    app = web.Application()
+    GraphQLView.attach(
+        app,
+        schema=schema,
+        enable_async=True,
+        sse=True,
+        context_factory=context_factory,
+        root_value_factory=lambda request: "streamed",
+    )
+    async with TestClient(TestServer(app)) as client:
+        url = "/graphql?query={slowConnection,root}"
+        headers = {"accept": "text/event-stream"}
+        response = await client.get(url, headers=headers)
+        assert response.status == 401
+
+        response = await client.get(url, headers={**headers, "Authorization": "1"})
+        assert response.status == 200
+        assert '{"data":{"slowConnection":1,"root":"streamed"}}' in (
+            await response.text()
+        )
+
+    assert pool.released == [1]
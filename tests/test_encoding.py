@@ -0,0 +1,77 @@
+import tracemalloc
+
+import pytest
+from graphql import ExecutionResult, GraphQLError
+from graphql_server import encode_execution_results
+
+from aiohttp_graphql.encoding import (
+    encode_execution_results as encode_execution_results_compact,
+)
+
+results = [
+    [ExecutionResult(data={"test": "Hello World"}, errors=None)],
+    [ExecutionResult(data=None, errors=[GraphQLError("Syntax error")])],
+    [
+        ExecutionResult(
+            data={"thrower": None},
+            errors=[GraphQLError("Throws!", path=["thrower"])],
+        )
+    ],
+    [None],
+]
+
+
+@pytest.mark.parametrize("execution_results", results)
+def test_matches_default_encoding(execution_results):
+    assert encode_execution_results_compact(
+        execution_results
+    ) == encode_execution_results(execution_results)
+
+
+def test_matches_default_batch_encoding():
+    execution_results = [result for batch in results for result in batch]
+
+    assert encode_execution_results_compact(
+        execution_results, is_batch=True
+    ) == encode_execution_results(execution_results, is_batch=True)
+
+
+def test_formats_errors_only_when_present():
+    calls = []
+
+    def format_error(error):
+        calls.append(error)
+        return {"message": error.message}
+
+    encode_execution_results_compact(results[0], format_error=format_error)
+    assert calls == []
+
+    body, status_code = encode_execution_results_compact(
+        results[1], format_error=format_error
+    )
+    assert len(calls) == 1
+    assert body == '{"errors":[{"message":"Syntax error"}]}'
+    assert status_code == 400
+
+
+def peak_allocation(encode, execution_results):
+    encode(execution_results)
+    tracemalloc.start()
+    try:
+        encode(execution_results)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_allocates_less_than_default_encoding():
+    execution_results = [
+        ExecutionResult(
+            data={"items": [{"id": i, "name": f"item{i}"} for i in range(1000)]},
+            errors=None,
+        )
+    ]
+
+    assert peak_allocation(
+        encode_execution_results_compact, execution_results
+    ) <= peak_allocation(encode_execution_results, execution_results)
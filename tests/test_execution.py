@@ -0,0 +1,220 @@
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+from graphql import GraphQLError, build_schema, execute, parse
+from graphql.execution.values import get_variable_values
+
+from aiohttp_graphql import GraphQLView
+from aiohttp_graphql.coercion import InvalidVariables, compile_variables_coercer
+from aiohttp_graphql.execution import CachedExecutionContext, DocumentCache
+
+from .app import url_string
+
+schema = build_schema(
+    """
+    enum Color { RED GREEN }
+
+    input Point { x: Float!, y: Float = 0 }
+
+    input Shape {
+      name: String!
+      color: Color = RED
+      points: [Point!]
+      children: [Shape]
+    }
+
+    type Query {
+      echo(
+        shape: Shape, ids: [ID], count: Int, flag: Boolean, color: Color
+      ): String
+    }
+
+    type Mutation {
+      draw(shapes: [Shape!]!): String
+    }
+    """
+)
+
+
+def echo(_root, _info, **args):
+    return repr(sorted(args.items()))
+
+
+schema.query_type.fields["echo"].resolve = echo
+
+QUERY = """
+query Echo(
+  $shape: Shape, $ids: [ID], $count: Int = 3, $flag: Boolean!, $color: Color
+) {
+  echo(shape: $shape, ids: $ids, count: $count, flag: $flag, color: $color)
+}
+"""
+
+
+def coerce(query, variables):
+    operation = parse(query).definitions[0]
+    coercer = compile_variables_coercer(schema, operation.variable_definitions)
+    expected = get_variable_values(schema, operation.variable_definitions, variables)
+    return coercer(variables), expected
+
+
+@pytest.mark.parametrize(
+    "variables",
+    [
+        {"flag": True},
+        {"flag": False, "count": None, "ids": None},
+        {"flag": True, "count": 7, "ids": [1, "2"], "color": "GREEN"},
+        {"flag": True, "ids": "single"},
+        {"flag": True, "shape": {"name": "a", "points": [{"x": 1}, {"x": 2, "y": 3}]}},
+        {"flag": True, "shape": {"name": "a", "points": [{"x": 1.5}]}},
+        {
+            "flag": True,
+            "shape": {
+                "name": "root",
+                "color": "GREEN",
+                "children": [{"name": "leaf", "children": [None]}, None],
+            },
+        },
+    ],
+)
+def test_compiled_coercer_matches_graphql_core(variables):
+    coerced, expected = coerce(QUERY, variables)
+    assert coerced == expected
+
+
+@pytest.mark.parametrize(
+    "variables",
+    [
+        {},
+        {"flag": None},
+        {"flag": "yes"},
+        {"flag": True, "count": 1.5},
+        {"flag": True, "color": "BLUE"},
+        {"flag": True, "shape": {"points": []}},
+        {"flag": True, "shape": {"name": "a", "unknown": 1}},
+        {"flag": True, "shape": {"name": "a", "points": [None]}},
+        {"flag": True, "shape": "a"},
+        {"flag": True, "shape": {"name": "a", "points": {"x": 1.5}}},
+    ],
+)
+def test_compiled_coercer_rejects_invalid_variables(variables):
+    with pytest.raises(InvalidVariables):
+        coerce(QUERY, variables)
+
+
+def test_compiled_coercer_copies_default_values():
+    query = "query ($shape: Shape = {name: \"a\"}) { echo(shape: $shape) }"
+    coerced, _ = coerce(query, {})
+    coerced["shape"]["name"] = "b"
+
+    assert coerce(query, {})[0] == {"shape": {"name": "a", "color": "RED"}}
+
+
+def test_document_cache_parses_and_validates_once():
+    cache = DocumentCache(schema, maxsize=2)
+    document, errors = cache.get("{ echo }")
+
+    assert errors == []
+    assert cache.get("{ echo }") == (document, errors)
+    assert cache.get("{ unknown }")[1][0].message == (
+        "Cannot query field 'unknown' on type 'Query'."
+    )
+    cache.get("{ __typename }")
+    assert len(cache) == 2
+    assert cache.get("{ echo }")[0] is not document
+
+
+def test_document_cache_raises_syntax_errors():
+    cache = DocumentCache(schema)
+
+    with pytest.raises(GraphQLError):
+        cache.get("{")
+    assert len(cache) == 0
+
+
+@pytest.mark.parametrize(
+    "variables,operation_name",
+    [
+        ({"flag": True, "shape": {"name": "a", "children": [{"name": "b"}]}}, None),
+        ({"flag": True, "count": 1.5, "shape": {"points": [{}]}}, None),
+        ({"flag": True}, "Echo"),
+        ({"flag": True}, "Unknown"),
+    ],
+)
+def test_cached_execution_matches_graphql_core(variables, operation_name):
+    document = DocumentCache(schema).get(QUERY)[0]
+    for _ in range(2):
+        result = execute(
+            schema,
+            document,
+            variable_values=variables,
+            operation_name=operation_name,
+            execution_context_class=CachedExecutionContext,
+        )
+        assert result == execute(
+            schema,
+            parse(QUERY),
+            variable_values=variables,
+            operation_name=operation_name,
+        )
+    expected_plans = [] if operation_name == "Unknown" else [operation_name]
+    assert list(document.plans) == expected_plans
+
+
+@pytest.fixture
+async def cached_client():
+    app = web.Application()
+    view = GraphQLView.attach(app, schema=schema, document_cache_size=2)
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    yield client, view
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_view_caches_documents(cached_client):
+    client, view = cached_client
+    for flag in ("true", "false"):
+        response = await client.get(
+            url_string(query=QUERY, variables=f'{{"flag": {flag}, "count": 1}}')
+        )
+        assert response.status == 200
+        assert await response.json() == {
+            "data": {"echo": f"[('count', 1), ('flag', {flag.title()})]"}
+        }
+
+    assert len(view.get_document_cache()) == 1
+
+
+@pytest.mark.asyncio
+async def test_view_reports_invalid_variables(cached_client):
+    client, _ = cached_client
+    response = await client.get(url_string(query=QUERY, variables='{"flag": "no"}'))
+
+    assert response.status == 400
+    assert await response.json() == {
+        "errors": [
+            {
+                "message": "Variable '$flag' got invalid value 'no';"
+                " Boolean cannot represent a non boolean value: 'no'",
+                "locations": [{"line": 3, "column": 47}],
+                "path": None,
+            }
+        ]
+    }
+
+
+@pytest.mark.asyncio
+async def test_view_rejects_cached_mutations_on_get(cached_client):
+    client, _ = cached_client
+    query = 'mutation { draw(shapes: [{name: "a"}]) }'
+    await client.post("/graphql", json={"query": query})
+    response = await client.get(url_string(query=query))
+
+    assert response.status == 405
+
+
+def test_view_document_cache_can_be_disabled():
+    view = GraphQLView(schema=schema, document_cache_size=0)
+
+    assert view.get_document_cache() is None
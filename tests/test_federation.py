@@ -0,0 +1,268 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+from graphql import build_schema, graphql, graphql_sync
+
+from aiohttp_graphql import GraphQLView
+from aiohttp_graphql.federation import Federation
+from aiohttp_graphql.graphqlview import EXTENSIONS_KEY
+
+SDL = """
+directive @key(fields: String!, resolvable: Boolean = true) repeatable on OBJECT
+
+type Query {
+  me: User
+}
+
+type User @key(fields: "id") {
+  id: ID!
+  name: String
+}
+
+type Product implements Node {
+  id: ID!
+  upc: String!
+  price: Int
+}
+
+interface Node {
+  id: ID!
+}
+
+type Review @key(fields: "id", resolvable: false) {
+  id: ID!
+}
+"""
+
+ENTITIES = """
+query ($representations: [_Any!]!) {
+  _entities(representations: $representations) {
+    __typename
+    ... on User { id name }
+    ... on Product { upc price }
+  }
+}
+"""
+
+
+class Product:
+    __typename = "Product"
+
+    def __init__(self, upc):
+        self.id = upc
+        self.upc = upc
+        self.price = len(upc)
+
+
+def create_schema(calls):
+    federation = Federation()
+
+    @federation.entity("Product", key=["upc", "id"])
+    async def resolve_products(representations, info):
+        calls.append(("Product", len(representations)))
+        await asyncio.sleep(0)
+        return [Product(representation["upc"]) for representation in representations]
+
+    @federation.entity("User")
+    def resolve_users(representations, info):
+        calls.append(("User", len(representations)))
+        return [
+            {"id": representation["id"], "name": f"User {representation['id']}"}
+            if representation["id"] != "missing"
+            else None
+            for representation in representations
+        ]
+
+    return federation.build_schema(build_schema(SDL))
+
+
+def test_service_sdl_declares_keys():
+    result = graphql_sync(create_schema([]), "{ _service { sdl } }")
+    sdl = result.data["_service"]["sdl"]
+
+    assert sdl.startswith(
+        'extend schema @link(url: "https://specs.apollo.dev/federation/v2.0",'
+        ' import: ["@key"])'
+    )
+    assert 'type User @key(fields: "id") {' in sdl
+    assert (
+        'type Product implements Node @key(fields: "upc") @key(fields: "id") {'
+        in sdl
+    )
+    assert 'type Review @key(fields: "id", resolvable: false) {' in sdl
+    assert "_entities" not in sdl and "_service" not in sdl
+
+
+def test_build_schema_leaves_the_schema_unchanged():
+    federation = Federation()
+    schema = build_schema(SDL)
+    federation.build_schema(schema)
+
+    assert list(schema.query_type.fields) == ["me"]
+    assert "_service" not in federation.print_sdl(schema)
+    sdl = graphql_sync(federation.build_schema(schema), "{ _service { sdl } }").data
+    assert "_entities" not in sdl["_service"]["sdl"]
+
+
+def test_build_schema_keeps_references_to_the_query_type():
+    schema = build_schema(
+        SDL.replace("me: User", "me: User\n  viewer: Query")
+        + "type Mutation { doIt: Query }"
+    )
+    schema.query_type.fields["me"].resolve = lambda *_: {"id": "1"}
+    schema.query_type.fields["viewer"].resolve = lambda root, _info: root
+    schema = Federation().build_schema(schema)
+
+    assert schema.mutation_type.fields["doIt"].type is schema.query_type
+    result = graphql_sync(
+        schema,
+        "{ viewer { viewer { me { id } _service { sdl } } } }",
+        root_value={},
+    )
+    assert result.errors is None
+    assert result.data["viewer"]["viewer"]["me"] == {"id": "1"}
+    assert "viewer: Query" in result.data["viewer"]["viewer"]["_service"]["sdl"]
+
+
+def test_entity_union_only_has_resolvable_entities():
+    schema = create_schema([])
+
+    assert [type_.name for type_ in schema.type_map["_Entity"].types] == [
+        "Product",
+        "User",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_entities_are_resolved_in_batches_by_type():
+    calls = []
+    representations = [
+        {"__typename": "User", "id": str(index)} for index in range(3)
+    ] + [{"__typename": "Product", "upc": "abc"}, {"__typename": "User", "id": "9"}]
+    result = await graphql(
+        create_schema(calls),
+        ENTITIES,
+        variable_values={"representations": representations},
+    )
+
+    assert result.errors is None
+    assert result.data == {
+        "_entities": [
+            {"__typename": "User", "id": "0", "name": "User 0"},
+            {"__typename": "User", "id": "1", "name": "User 1"},
+            {"__typename": "User", "id": "2", "name": "User 2"},
+            {"__typename": "Product", "upc": "abc", "price": 3},
+            {"__typename": "User", "id": "9", "name": "User 9"},
+        ]
+    }
+    assert sorted(calls) == [("Product", 1), ("User", 4)]
+
+
+@pytest.mark.asyncio
+async def test_entity_errors_are_reported_at_their_path():
+    representations = [
+        {"__typename": "User", "id": "missing"},
+        {"__typename": "Unknown", "id": "1"},
+        {"__typename": "User", "id": "1"},
+    ]
+    result = await graphql(
+        create_schema([]),
+        ENTITIES,
+        variable_values={"representations": representations},
+    )
+
+    assert result.data == {
+        "_entities": [None, None, {"__typename": "User", "id": "1", "name": "User 1"}]
+    }
+    assert [(error.message, error.path) for error in result.errors] == [
+        ("Unknown entity type 'Unknown'.", ["_entities", 1])
+    ]
+
+
+def test_reference_resolvers_must_return_one_entity_per_representation():
+    federation = Federation()
+    federation.entity("User")(lambda representations, info: [])
+    schema = federation.build_schema(build_schema(SDL))
+    result = graphql_sync(
+        schema,
+        '{ _entities(representations: [{__typename: "User", id: "1"}])'
+        " { __typename } }",
+    )
+
+    assert result.data == {"_entities": [None]}
+    assert result.errors[0].message == (
+        "The reference resolver of 'User' returned 0 entities for 1 representations."
+    )
+
+
+def test_entities_without_reference_resolvers_are_their_representations():
+    federation = Federation()
+    schema = federation.build_schema(build_schema(SDL))
+    result = graphql_sync(
+        schema,
+        '{ _entities(representations: [{__typename: "User", id: "1"}])'
+        " { ... on User { id } } }",
+    )
+
+    assert result.data == {"_entities": [{"id": "1"}]}
+
+
+def test_unknown_entity_types_are_rejected():
+    federation = Federation()
+    federation.entity("Missing")
+
+    with pytest.raises(TypeError, match="Unknown entity types: Missing."):
+        federation.build_schema(build_schema(SDL))
+
+
+@pytest.mark.asyncio
+async def test_view_accepts_router_extensions():
+    extensions = []
+
+    def resolve_users(representations, info):
+        extensions.append(info.context["request"][EXTENSIONS_KEY])
+        return representations
+
+    federation = Federation()
+    federation.entity("User")(resolve_users)
+    app = web.Application()
+    GraphQLView.attach(
+        app, schema=federation.build_schema(build_schema(SDL)), enable_async=True
+    )
+    async with TestClient(TestServer(app)) as client:
+        response = await client.post(
+            "/graphql",
+            json={
+                "query": ENTITIES.replace("... on Product { upc price }", ""),
+                "variables": {"representations": [{"__typename": "User", "id": "1"}]},
+                "extensions": {"queryPlan": {"kind": "Fetch"}},
+            },
+            headers={"apollo-federation-include-trace": "ftv1"},
+        )
+
+        assert response.status == 200
+        assert await response.json() == {
+            "data": {"_entities": [{"__typename": "User", "id": "1", "name": None}]}
+        }
+    assert extensions == [{"queryPlan": {"kind": "Fetch"}}]
+
+
+@pytest.mark.asyncio
+async def test_view_reports_invalid_extensions():
+    app = web.Application()
+    GraphQLView.attach(app, schema=Federation().build_schema(build_schema(SDL)))
+    async with TestClient(TestServer(app)) as client:
+        response = await client.get(
+            "/graphql", params={"query": "{ me { id } }", "extensions": "{"}
+        )
+        assert response.status == 400
+        assert (await response.json())["errors"][0]["message"] == (
+            "Extensions are invalid JSON."
+        )
+
+        response = await client.get(
+            "/graphql", params={"query": "{ me { id } }", "extensions": "{}"}
+        )
+        assert response.status == 200
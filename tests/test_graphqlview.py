@@ -687,3 +687,45 @@ async def test_preflight_incorrect_request(client):
     )
 
     assert response.status == 400
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "app",
+    [create_app(schema=AsyncSchema, enable_async=True, batch=True, batch_stream=True)],
+)
+async def test_batch_stream_writes_results_as_they_complete(app, client):
+    response = await client.post(
+        "/graphql",
+        data=json.dumps([dict(query="{b}"), dict(query="{a}"), dict(query="{x}")]),
+        headers={"content-type": "application/json", "accept": "application/x-ndjson"},
+    )
+
+    assert response.status == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in (await response.text()).splitlines()]
+    assert [line["index"] for line in lines] == [2, 1, 0]
+    assert lines[1:] == [
+        {"index": 1, "status": 200, "payload": {"data": {"a": "hey"}}},
+        {"index": 0, "status": 200, "payload": {"data": {"b": "hey2"}}},
+    ]
+    assert lines[0]["status"] == 400
+    assert lines[0]["payload"]["errors"][0]["message"].startswith(
+        "Cannot query field 'x' on type 'AsyncQueryType'."
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "app",
+    [create_app(schema=AsyncSchema, enable_async=True, batch=True, batch_stream=True)],
+)
+async def test_batch_stream_requires_ndjson_accept(app, client):
+    response = await client.post(
+        "/graphql",
+        data=json.dumps([dict(query="{b}"), dict(query="{a}")]),
+        headers={"content-type": "application/json"},
+    )
+
+    assert response.status == 200
+    assert await response.json() == [{"data": {"b": "hey2"}}, {"data": {"a": "hey"}}]
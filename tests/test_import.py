@@ -0,0 +1,55 @@
+import json
+import subprocess
+import sys
+
+# Cumulative import time budget of ``import aiohttp_graphql``, in microseconds.
+IMPORT_TIME_BUDGET = 50000
+
+
+def run_python(code, *options):
+    return subprocess.run(
+        [sys.executable, *options, "-c", code],
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+
+
+def loaded_modules(code, modules):
+    output = run_python(
+        f"import sys\n{code}\n"
+        f"print(__import__('json').dumps([m for m in {modules!r} if m in sys.modules]))"
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def test_import_does_not_load_dependencies():
+    modules = ["aiohttp", "graphql", "graphql_server", "jinja2"]
+
+    assert loaded_modules("import aiohttp_graphql", modules) == []
+
+
+def test_view_does_not_load_graphiql_renderer():
+    modules = ["graphql_server.render_graphiql", "jinja2"]
+
+    assert loaded_modules("from aiohttp_graphql import GraphQLView", modules) == []
+
+
+def test_import_time_is_within_budget():
+    stderr = run_python("import aiohttp_graphql", "-X", "importtime").stderr
+    timings = {}
+    for line in stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                timings[name.strip()] = int(cumulative)
+
+    assert timings["aiohttp_graphql"] < IMPORT_TIME_BUDGET
+
+
+def test_lazy_exports():
+    import aiohttp_graphql
+
+    assert "GraphQLView" in dir(aiohttp_graphql)
+    assert aiohttp_graphql.GraphQLView.__module__ == "aiohttp_graphql.graphqlview"
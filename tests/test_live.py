@@ -0,0 +1,224 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+from graphql import build_schema
+
+from aiohttp_graphql.live import (
+    InvalidationBus,
+    LiveQueryView,
+    _forget,
+    json_diff,
+    track,
+)
+
+
+def test_json_diff_replaces_changed_values():
+    assert json_diff({"a": 1, "b": {"c": 2}}, {"a": 1, "b": {"c": 3}}) == [
+        {"op": "replace", "path": "/b/c", "value": 3}
+    ]
+
+
+def test_json_diff_adds_and_removes_keys():
+    assert json_diff({"a": 1, "b/c": 2}, {"a": 1, "d~": 3}) == [
+        {"op": "remove", "path": "/b~1c"},
+        {"op": "add", "path": "/d~0", "value": 3},
+    ]
+
+
+def test_json_diff_lists():
+    assert json_diff([1, 2, 3], [1, 5]) == [
+        {"op": "replace", "path": "/1", "value": 5},
+        {"op": "remove", "path": "/2"},
+    ]
+    assert json_diff([1], [1, 2]) == [{"op": "add", "path": "/-", "value": 2}]
+
+
+def test_json_diff_equal_values():
+    assert json_diff({"a": [1, {"b": None}]}, {"a": [1, {"b": None}]}) == []
+
+
+class Store:
+    def __init__(self):
+        self.counter = 0
+        self.executions = 0
+
+
+@pytest.fixture
+def store():
+    return Store()
+
+
+@pytest.fixture
+def bus():
+    return InvalidationBus()
+
+
+@pytest.fixture
+def app(store, bus):
+    schema = build_schema(
+        "type Query { counter: Int, name: String } type Mutation { reset: Int }"
+    )
+
+    def resolve_counter(_root, info):
+        store.executions += 1
+        track(info, "counter")
+        return store.counter
+
+    schema.query_type.fields["counter"].resolve = resolve_counter
+    schema.query_type.fields["name"].resolve = lambda _root, _info: "live"
+
+    app = web.Application()
+    LiveQueryView.attach(app, schema=schema, bus=bus, debounce=0.01)
+    return app
+
+
+@pytest.fixture
+async def client(app):
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    yield client
+    await client.close()
+
+
+async def start(client, query):
+    ws = await client.ws_connect("/graphql/live")
+    await ws.send_json({"type": "start", "id": "1", "payload": {"query": query}})
+    return ws
+
+
+@pytest.mark.asyncio
+async def test_plain_query_completes(client):
+    ws = await start(client, "{ counter }")
+
+    assert await ws.receive_json() == {
+        "type": "data",
+        "id": "1",
+        "payload": {"data": {"counter": 0}},
+    }
+    assert await ws.receive_json() == {"type": "complete", "id": "1"}
+    await ws.close()
+
+
+@pytest.mark.asyncio
+async def test_live_query_sends_patches(client, store, bus):
+    ws = await start(client, "query @live { counter name }")
+    assert (await ws.receive_json())["payload"] == {
+        "data": {"counter": 0, "name": "live"}
+    }
+
+    store.counter = 1
+    bus.publish("counter")
+
+    assert await ws.receive_json() == {
+        "type": "patch",
+        "id": "1",
+        "payload": [{"op": "replace", "path": "/data/counter", "value": 1}],
+    }
+    await ws.close()
+
+
+@pytest.mark.asyncio
+async def test_live_query_debounces_invalidations(client, store, bus):
+    ws = await start(client, "query @live { counter }")
+    await ws.receive_json()
+
+    store.counter = 3
+    for _ in range(3):
+        bus.publish("counter")
+
+    assert (await ws.receive_json())["payload"][0]["value"] == 3
+    await asyncio.sleep(0.05)
+    assert store.executions == 2
+    await ws.close()
+
+
+@pytest.mark.asyncio
+async def test_live_query_ignores_untouched_resources(client, store, bus):
+    ws = await start(client, "query @live { counter }")
+    await ws.receive_json()
+
+    bus.publish("other")
+    await asyncio.sleep(0.05)
+
+    assert store.executions == 1
+    await ws.close()
+
+
+@pytest.mark.asyncio
+async def test_reports_validation_errors(client):
+    ws = await start(client, "query @live { unknown }")
+
+    message = await ws.receive_json()
+    assert message["type"] == "error"
+    assert message["payload"][0]["message"] == (
+        "Cannot query field 'unknown' on type 'Query'."
+    )
+    await ws.close()
+
+
+@pytest.mark.asyncio
+async def test_live_is_only_supported_on_queries(client, store):
+    ws = await start(client, "mutation @live { reset }")
+
+    assert await ws.receive_json() == {
+        "type": "error",
+        "id": "1",
+        "payload": [
+            {
+                "message": "Directive '@live' may only be used on queries.",
+                "locations": [{"line": 1, "column": 10}],
+                "path": None,
+            }
+        ],
+    }
+    assert store.executions == 0
+    await ws.close()
+
+
+@pytest.mark.asyncio
+async def test_reports_invalid_variables(client):
+    ws = await client.ws_connect("/graphql/live")
+    payload = {"query": "{ counter }", "variables": []}
+    await ws.send_json({"type": "start", "id": "1", "payload": payload})
+
+    assert await ws.receive_json() == {
+        "type": "error",
+        "id": "1",
+        "payload": [
+            {"message": "Variables must be an object.", "locations": None, "path": None}
+        ],
+    }
+    await ws.close()
+
+
+@pytest.mark.asyncio
+async def test_finished_operations_are_forgotten():
+    operations = {}
+    task = asyncio.ensure_future(asyncio.sleep(0))
+    operations["1"] = task
+    task.add_done_callback(lambda task: _forget(operations, "1", task))
+    await task
+    await asyncio.sleep(0)
+
+    assert operations == {}
+
+
+@pytest.mark.asyncio
+async def test_failed_operations_are_logged(caplog):
+    class FailingView(LiveQueryView):
+        def get_context(self, request):
+            raise RuntimeError("No context.")
+
+    app = web.Application()
+    FailingView.attach(app, schema=build_schema("type Query { name: String }"))
+    async with TestClient(TestServer(app)) as client:
+        ws = await start(client, "{ name }")
+        await ws.send_json({"type": "start", "id": "2", "payload": {}})
+        assert (await ws.receive_json())["id"] == "2"
+        await ws.close()
+
+    [record] = caplog.records
+    assert record.getMessage() == "Live operation '1' failed."
+    assert str(record.exc_info[1]) == "No context."
@@ -0,0 +1,67 @@
+import pytest
+from aiohttp import ClientSession
+from aiohttp.test_utils import TestServer
+
+from .loadtest import (
+    LoopLagMonitor,
+    compare,
+    create_loadtest_app,
+    generate_load,
+    percentiles,
+    summarize,
+)
+
+
+@pytest.fixture
+async def server():
+    server = TestServer(create_loadtest_app())
+    await server.start_server()
+    yield server
+    await server.close()
+
+
+def test_percentiles():
+    result = percentiles([i / 100 for i in range(100, 0, -1)])
+
+    assert result == {"count": 100, "p50": 0.51, "p90": 0.91, "p99": 1.0, "max": 1.0}
+    assert percentiles([])["count"] == 0
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    baseline = {
+        "errors": 0,
+        "latency": {"p50": 0.010, "p99": 0.050},
+        "loop_lag": {"p99": 0.002},
+    }
+    report = {
+        "errors": 0,
+        "latency": {"p50": 0.011, "p99": 0.070},
+        "loop_lag": {"p99": 0.002},
+    }
+
+    assert compare(report, baseline, tolerance=0.2) == [
+        "latency p99: 70.00ms > 60.00ms"
+    ]
+    assert compare(report, baseline, tolerance=0.5) == []
+
+
+@pytest.mark.asyncio
+async def test_generate_load_is_reproducible(server):
+    monitor = LoopLagMonitor(interval=0.001)
+    monitor.start()
+    async with ClientSession() as session:
+        runs = [
+            await generate_load(
+                session, str(server.make_url("")), rate=200, duration=0.1, seed=1
+            )
+            for _ in range(2)
+        ]
+    await monitor.stop()
+
+    assert [name for name, _, _ in runs[0]] and sorted(
+        name for name, _, _ in runs[0]
+    ) == sorted(name for name, _, _ in runs[1])
+    report = summarize(runs[0], [delay for _, delay in monitor.trace], 0.1)
+    assert report["errors"] == 0
+    assert report["requests"] == report["latency"]["count"] == len(runs[0])
+    assert report["loop_lag"]["count"] > 0
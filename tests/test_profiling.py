@@ -0,0 +1,155 @@
+import json
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from aiohttp_graphql.profiling import (
+    SlowQueryProfiler,
+    main,
+    redact_query,
+    redact_variables,
+    worst_offenders,
+)
+
+from .app import create_app, url_string
+
+
+@pytest.fixture
+def profiler(tmp_path):
+    profiler = SlowQueryProfiler(str(tmp_path / "slow.log"), threshold=0.0)
+    yield profiler
+    profiler.close()
+
+
+@pytest.fixture
+def app(profiler):
+    app = create_app(profiler=profiler)
+    app.router.add_get("/slow-queries", profiler.handler)
+    return app
+
+
+@pytest.fixture
+async def client(app):
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    yield client
+    await client.close()
+
+
+def read_log(profiler):
+    with open(profiler.path) as log_file:
+        return [json.loads(line) for line in log_file]
+
+
+def test_redact_variables():
+    assert redact_variables(
+        {"who": "Dolly", "password": "x", "input": [{"apiKey": "y", "n": 1}]}
+    ) == {
+        "who": "Dolly",
+        "password": "[REDACTED]",
+        "input": [{"apiKey": "[REDACTED]", "n": 1}],
+    }
+
+
+def test_redact_query():
+    assert redact_query(
+        'mutation { login(user: "bob", password: "hunter2", pin: 1234, r: 0.5)'
+        " { ok } }"
+    ) == (
+        "mutation {\n"
+        '  login(user: "[REDACTED]", password: "[REDACTED]", pin: 0, r: 0.0) {\n'
+        "    ok\n"
+        "  }\n"
+        "}\n"
+    )
+    assert redact_query('{ login(password: "hunter2" }') is None
+
+
+def test_profilers_own_their_log_files(tmp_path):
+    first = SlowQueryProfiler(str(tmp_path / "first.log"), threshold=0.0)
+    second = SlowQueryProfiler(str(tmp_path / "second.log"), threshold=0.0)
+    first.close()
+    second.finish(second.start())
+    second.close()
+
+    assert not (tmp_path / "first.log").exists()
+    assert len(read_log(second)) == 1
+
+
+@pytest.mark.asyncio
+async def test_logs_requests_above_threshold(client, profiler):
+    response = await client.get(
+        url_string(
+            query="query helloWho($who: String) { test(who: $who) }",
+            variables=json.dumps({"who": "Dolly", "token": "secret"}),
+            operationName="helloWho",
+        )
+    )
+    assert response.status == 200
+
+    [entry] = read_log(profiler)
+    assert entry["status"] == 200
+    assert entry["sampled"] is False
+    assert set(entry["phases"]) == {"parse", "execute", "encode"}
+    assert entry["operations"][0]["operation_name"] == "helloWho"
+    assert entry["operations"][0]["variables"] == {
+        "who": "Dolly",
+        "token": "[REDACTED]",
+    }
+    assert "profile" not in entry
+
+
+@pytest.mark.asyncio
+async def test_logs_unexpected_failures_as_server_errors(profiler):
+    def context_factory(request):
+        raise RuntimeError("database is down")
+
+    app = create_app(profiler=profiler, context_factory=context_factory)
+    async with TestClient(TestServer(app)) as client:
+        response = await client.get(url_string(query="{test}"))
+
+    assert response.status == 500
+    [entry] = read_log(profiler)
+    assert entry["status"] == 500
+
+
+@pytest.mark.asyncio
+async def test_skips_fast_unsampled_requests(client, profiler):
+    profiler.threshold = 60.0
+    await client.get(url_string(query="{test}"))
+    await client.get(url_string(query="{test}"))
+
+    with pytest.raises(FileNotFoundError):
+        read_log(profiler)
+
+
+@pytest.mark.asyncio
+async def test_sampled_requests_are_profiled(client, profiler):
+    profiler.threshold = 60.0
+    profiler.sample_rate = 1.0
+    await client.get(url_string(query="{test}"))
+
+    [entry] = read_log(profiler)
+    assert entry["sampled"] is True
+    assert entry["profile"]
+    assert {"allocated", "peak"} <= set(entry["memory"])
+
+
+@pytest.mark.asyncio
+async def test_lists_worst_offenders(client, profiler, capsys):
+    await client.get(url_string(query="query fast { test }"))
+    await client.get(url_string(query="{ thrower }"))
+    await client.get(url_string(query="query fast { test }"))
+
+    offenders = worst_offenders([profiler.path])
+    assert sorted(stats["operation"] for stats in offenders) == [
+        "fast",
+        "{\n  thrower\n}\n",
+    ]
+    assert {stats["operation"]: stats["count"] for stats in offenders}["fast"] == 2
+
+    response = await client.get("/slow-queries", params={"top": "1"})
+    assert len(await response.json()) == 1
+
+    main([profiler.path, "--top", "5"])
+    assert "'fast'" in capsys.readouterr().out
@@ -0,0 +1,258 @@
+import time
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+from graphql import build_schema, parse
+
+from aiohttp_graphql import GraphQLView
+from aiohttp_graphql.execution import DocumentCache
+from aiohttp_graphql.ratelimit import LocalStore, RateLimiter, query_cost
+
+schema = build_schema(
+    """
+    type Query {
+      user(id: ID): User
+      users(first: Int): [User!]!
+      search: [Result]
+    }
+
+    type User {
+      name: String
+      friends(limit: Int): [User]
+      tags: [[String]]
+    }
+
+    type Post {
+      title: String
+    }
+
+    union Result = User | Post
+    """
+)
+
+
+class Timer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.parametrize(
+    "query,variables,cost",
+    [
+        ("{ __typename }", None, 0),
+        ("{ user { name } }", None, 2),
+        ("{ users(first: 3) { name } }", None, 6),
+        ("{ users { name } }", None, 20),
+        ("{ users(first: 2) { friends(limit: 5) { name } } }", None, 2 * (1 + 5 * 2)),
+        ("{ user { tags } }", None, 1 + 100),
+        ("query ($n: Int) { users(first: $n) { name } }", {"n": 4}, 8),
+        ("query ($n: Int = 2) { users(first: $n) { name } }", None, 4),
+        ("{ users(first: -5) { name } }", None, 20),
+        ("query ($n: Int) { users(first: $n) { name } }", {"n": -5}, 20),
+        ("query ($n: Int) { users(first: $n) { name } }", {"n": True}, 20),
+        ("query ($n: Int = -5) { users(first: $n) { name } }", None, 20),
+        ("{ user { ...F } } fragment F on User { name friends { name } }", None, 22),
+        ("{ search { ... on User { name } ... on Post { title } } }", None, 30),
+    ],
+)
+def test_query_cost(query, variables, cost):
+    assert query_cost(schema, parse(query), variables=variables)[0] == cost
+
+
+def nested_fragments(depth):
+    fragments = ["fragment F0 on Query { user { name } }"] + [
+        f"fragment F{i} on Query {{ ...F{i - 1} ...F{i - 1} }}"
+        for i in range(1, depth + 1)
+    ]
+    return parse(f"{{ ...F{depth} }} " + " ".join(fragments))
+
+
+def test_query_cost_counts_repeated_fragment_spreads_once():
+    started = time.perf_counter()
+
+    assert query_cost(schema, nested_fragments(40))[0] == 2
+    assert time.perf_counter() - started < 1
+
+
+def test_query_cost_stops_past_max_cost():
+    document = parse(
+        "{ a: users(first: 2) { name } b: users(first: 2) { name }"
+        " c: users(first: 2) { name } }"
+    )
+
+    assert query_cost(schema, document)[0] == 12
+    assert query_cost(schema, document, max_cost=5)[0] == 8
+
+
+def test_query_cost_tells_if_it_depends_on_variables():
+    document = parse("query ($n: Int) { users(first: $n) { name } }")
+
+    assert query_cost(schema, document)[1] is True
+    assert query_cost(schema, parse("{ users { name } }"))[1] is False
+
+
+def test_costs_are_cached_with_documents():
+    limiter = RateLimiter()
+    document = DocumentCache(schema).get("{ users(first: 3) { name } }")[0]
+
+    assert limiter.operation_cost(schema, document) == 6
+    assert document.costs == {None: 6}
+
+
+def test_costs_of_unknown_operations_are_not_cached():
+    limiter = RateLimiter()
+    document = DocumentCache(schema).get("query Q { users(first: 3) { name } }")[0]
+
+    for name in ("A", "B", "Q"):
+        limiter.operation_cost(schema, document, name)
+    assert document.costs == {"Q": 6}
+
+
+def test_local_store_refills_buckets():
+    timer = Timer()
+    store = LocalStore(timer=timer)
+
+    assert store.consume("a", 8, rate=2, burst=10) == (True, 0.0)
+    assert store.consume("a", 4, rate=2, burst=10) == (False, 1.0)
+    timer.now = 1
+    assert store.consume("a", 4, rate=2, burst=10) == (True, 0.0)
+    assert store.consume("b", 10, rate=2, burst=10) == (True, 0.0)
+
+
+def test_local_store_rejects_negative_costs():
+    store = LocalStore(timer=Timer())
+
+    with pytest.raises(ValueError, match="The cost cannot be negative, got -1."):
+        store.consume("a", -1, rate=1, burst=10)
+    assert len(store) == 0
+
+
+def test_local_store_evicts_idle_buckets():
+    timer = Timer()
+    store = LocalStore(timer=timer)
+    store.consume("a", 1, rate=1, burst=10)
+    timer.now = 5
+    store.consume("b", 1, rate=1, burst=10)
+
+    assert len(store) == 2
+    timer.now = 10
+    store.consume("c", 1, rate=1, burst=10)
+    assert list(store._buckets) == ["b", "c"]
+
+
+def test_local_store_is_bounded():
+    store = LocalStore(maxsize=2, timer=Timer())
+    for key in "abc":
+        store.consume(key, 1, rate=1, burst=10)
+
+    assert list(store._buckets) == ["b", "c"]
+
+
+@pytest.fixture
+async def client():
+    timer = Timer()
+    limiter = RateLimiter(
+        rate=1,
+        burst=25,
+        identify=lambda request: request.headers.get("X-Client"),
+        store=LocalStore(timer=timer),
+    )
+    app = web.Application()
+    GraphQLView.attach(app, schema=schema, batch=True, rate_limiter=limiter)
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    yield client
+    await client.close()
+
+
+async def post(client, query, name="a"):
+    return await client.post(
+        "/graphql", json={"query": query}, headers={"X-Client": name}
+    )
+
+
+@pytest.mark.asyncio
+async def test_view_charges_query_costs(client):
+    response = await post(client, "{ users { name } }")
+    assert response.status == 200
+
+    response = await post(client, "{ users { name } }")
+    assert response.status == 429
+    assert response.headers["Retry-After"] == "15"
+    assert await response.json() == {
+        "errors": [
+            {
+                "message": "Rate limit exceeded: query cost 20,"
+                " retry in 15.0 seconds.",
+                "locations": None,
+                "path": None,
+            }
+        ]
+    }
+
+    response = await post(client, "{ users { name } }", name="b")
+    assert response.status == 200
+    response = await post(client, "{ __typename }")
+    assert response.status == 200
+
+
+@pytest.mark.asyncio
+async def test_view_charges_batches_at_once(client):
+    batch = [{"query": "{ user { name } }"}] * 3
+    response = await client.post("/graphql", json=batch, headers={"X-Client": "a"})
+    assert response.status == 200
+
+    response = await client.post(
+        "/graphql", json=batch * 4, headers={"X-Client": "a"}
+    )
+    assert response.status == 429
+    assert response.headers["Retry-After"] == "5"
+
+
+@pytest.mark.asyncio
+async def test_view_rejects_queries_costing_more_than_the_burst(client):
+    response = await post(client, "{ users(first: 20) { name } }")
+
+    assert response.status == 400
+    assert (await response.json())["errors"][0]["message"] == (
+        "Query cost exceeds the limit of 25."
+    )
+
+
+@pytest.mark.asyncio
+async def test_view_does_not_charge_invalid_queries(client):
+    for _ in range(3):
+        response = await post(client, "{ users { unknown } }")
+        assert response.status == 400
+    response = await post(client, "{ users { name } }")
+    assert response.status == 200
+
+
+@pytest.mark.asyncio
+async def test_event_streams_are_charged():
+    limiter = RateLimiter(rate=1, burst=25, store=LocalStore(timer=Timer()))
+    app = web.Application()
+    GraphQLView.attach(app, schema=schema, sse=True, rate_limiter=limiter)
+    async with TestClient(TestServer(app)) as client:
+        headers = {"accept": "text/event-stream"}
+        response = await client.get(
+            "/graphql", params={"query": "{ users { name } }"}, headers=headers
+        )
+        assert response.status == 200
+        await response.read()
+
+        token = await (await client.put("/graphql")).text()
+        response = await client.post(
+            "/graphql",
+            json={
+                "query": "{ users { name } }",
+                "extensions": {"operationId": "a"},
+            },
+            headers={"X-GraphQL-Event-Stream-Token": token},
+        )
+        assert response.status == 429
+        assert response.headers["Retry-After"] == "15"
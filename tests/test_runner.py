@@ -0,0 +1,91 @@
+import socket
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from aiohttp_graphql.graphqlview import find_views
+from aiohttp_graphql.runner import WorkerMetrics, create_socket, warm_app
+
+from .app import create_app, url_string
+
+
+@pytest.fixture
+def app():
+    app = create_app()
+    return app
+
+
+@pytest.fixture
+def metrics(app):
+    metrics = WorkerMetrics(2)
+    app.middlewares.append(metrics.middleware())
+    app.router.add_get("/metrics", metrics.handler)
+    return metrics
+
+
+@pytest.fixture
+async def client(app, metrics):
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    yield client
+    await client.close()
+
+
+def test_find_views_returns_attached_views(app):
+    views = find_views(app)
+
+    assert len(views) == 1
+    assert views[0].schema is not None
+
+
+def test_warm_app_validates_schema(app):
+    [view] = find_views(app)
+    warm_app(app, ["{test}"])
+
+    assert view.schema._validation_errors == []
+
+
+def test_warm_app_rejects_invalid_queries(app):
+    with pytest.raises(ValueError):
+        warm_app(app, ["{unknown}"])
+
+
+def test_create_socket_is_listening_and_inheritable():
+    sock = create_socket("127.0.0.1", 0)
+    try:
+        assert sock.getsockname()[1]
+        assert sock.get_inheritable()
+        if hasattr(socket, "SO_REUSEPORT"):
+            assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT)
+    finally:
+        sock.close()
+
+
+def test_metrics_are_aggregated_over_workers():
+    metrics = WorkerMetrics(2)
+    metrics.record(0.1, 200)
+    metrics.index = 1
+    metrics.record(0.3, 400)
+    metrics.record(0.2, 200)
+
+    snapshot = metrics.snapshot()
+
+    assert snapshot["workers"][0]["requests"] == 1
+    assert snapshot["workers"][1]["requests"] == 2
+    assert snapshot["workers"][1]["errors"] == 1
+    assert snapshot["total"]["requests"] == 3
+    assert snapshot["total"]["errors"] == 1
+    assert snapshot["total"]["latency_max"] == pytest.approx(0.3)
+    assert snapshot["total"]["latency_avg"] == pytest.approx(0.2)
+
+
+@pytest.mark.asyncio
+async def test_metrics_middleware_records_requests(client, metrics):
+    await client.get(url_string(query="{test}"))
+    await client.get(url_string(query="{unknown}"))
+    response = await client.get("/metrics")
+
+    assert response.status == 200
+    _json = await response.json()
+    assert _json["total"]["requests"] == 2
+    assert _json["total"]["errors"] == 1
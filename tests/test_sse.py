@@ -0,0 +1,240 @@
+import json
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from aiohttp_graphql.sse import EventStream
+
+from .app import create_app
+from .schema import SubscriptionSchema
+
+TOKEN_HEADER = "X-GraphQL-Event-Stream-Token"
+
+
+@pytest.fixture
+def app():
+    app = create_app(schema=SubscriptionSchema, enable_async=True, sse=True)
+    return app
+
+
+@pytest.fixture
+async def client(app):
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    yield client
+    await client.close()
+
+
+def parse_events(text):
+    events = []
+    for block in text.split("\n\n"):
+        fields = dict(
+            line.split(": ", 1) if ": " in line else (line.rstrip(":"), "")
+            for line in block.splitlines()
+            if not line.startswith(":")
+        )
+        if fields:
+            events.append(fields)
+    return events
+
+
+async def read_events(response, count):
+    text = ""
+    while len(parse_events(text)) < count:
+        text += (await response.content.readuntil(b"\n\n")).decode()
+    return parse_events(text)
+
+
+@pytest.mark.asyncio
+async def test_distinct_connection_streams_subscription(client):
+    response = await client.post(
+        "/graphql",
+        data=json.dumps({"query": "subscription { countdown(start: 2) }"}),
+        headers={"content-type": "application/json", "accept": "text/event-stream"},
+    )
+
+    assert response.status == 200
+    assert response.headers["content-type"] == "text/event-stream"
+    events = parse_events(await response.text())
+    assert [event["event"] for event in events] == ["next"] * 3 + ["complete"]
+    assert [json.loads(event["data"]) for event in events[:3]] == [
+        {"data": {"countdown": 2}},
+        {"data": {"countdown": 1}},
+        {"data": {"countdown": 0}},
+    ]
+    assert [event["id"] for event in events] == ["1", "2", "3", "4"]
+
+
+@pytest.mark.asyncio
+async def test_distinct_connection_runs_queries(client):
+    response = await client.get(
+        "/graphql", params={"query": "{ a }"}, headers={"accept": "text/event-stream"},
+    )
+
+    events = parse_events(await response.text())
+    assert json.loads(events[0]["data"]) == {"data": {"a": "hey"}}
+    assert events[1]["event"] == "complete"
+
+
+@pytest.mark.asyncio
+async def test_distinct_connection_reports_validation_errors(client):
+    response = await client.post(
+        "/graphql",
+        data=json.dumps({"query": "subscription { unknown }"}),
+        headers={"content-type": "application/json", "accept": "text/event-stream"},
+    )
+
+    assert response.status == 400
+    assert (await response.json())["errors"][0]["message"] == (
+        "Cannot query field 'unknown' on type 'SubscriptionType'."
+    )
+
+
+async def start(client, token, operation_id, query):
+    return await client.post(
+        "/graphql",
+        data=json.dumps({"query": query, "extensions": {"operationId": operation_id}}),
+        headers={"content-type": "application/json", TOKEN_HEADER: token},
+    )
+
+
+@pytest.mark.asyncio
+async def test_single_connection_multiplexes_operations(client):
+    reservation = await client.put("/graphql")
+    assert reservation.status == 201
+    token = await reservation.text()
+
+    stream = await client.get(
+        "/graphql", headers={"accept": "text/event-stream", TOKEN_HEADER: token}
+    )
+    assert (await start(client, token, "a", "{ c }")).status == 202
+    assert (
+        await start(client, token, "b", "subscription { countdown(start: 1) }")
+    ).status == 202
+
+    events = await read_events(stream, 5)
+    by_operation = {}
+    for event in events:
+        data = json.loads(event["data"])
+        by_operation.setdefault(data["id"], []).append(
+            (event["event"], data.get("payload"))
+        )
+
+    assert by_operation == {
+        "a": [("next", {"data": {"c": "hey3"}}), ("complete", None)],
+        "b": [
+            ("next", {"data": {"countdown": 1}}),
+            ("next", {"data": {"countdown": 0}}),
+            ("complete", None),
+        ],
+    }
+    stream.close()
+
+
+@pytest.mark.asyncio
+async def test_single_connection_resumes_from_last_event_id(client):
+    token = await (await client.put("/graphql")).text()
+    await start(client, token, "a", "subscription { countdown(start: 2) }")
+
+    first = await client.get(
+        "/graphql", headers={"accept": "text/event-stream", TOKEN_HEADER: token}
+    )
+    [event] = await read_events(first, 1)
+    first.close()
+
+    second = await client.get(
+        "/graphql",
+        headers={
+            "accept": "text/event-stream",
+            TOKEN_HEADER: token,
+            "Last-Event-ID": event["id"],
+        },
+    )
+    events = await read_events(second, 3)
+    second.close()
+
+    assert [int(event["id"]) for event in events] == [2, 3, 4]
+    assert events[-1]["event"] == "complete"
+
+
+@pytest.mark.asyncio
+async def test_single_connection_rejects_invalid_last_event_id(client):
+    token = await (await client.put("/graphql")).text()
+    response = await client.get(
+        "/graphql",
+        headers={
+            "accept": "text/event-stream",
+            TOKEN_HEADER: token,
+            "Last-Event-ID": "abc",
+        },
+    )
+
+    assert response.status == 400
+    assert (await response.json())["errors"][0]["message"] == (
+        "Invalid Last-Event-ID header."
+    )
+
+
+@pytest.mark.asyncio
+async def test_stream_writes_events_pushed_by_the_last_operation():
+    stream = EventStream(None)
+    stream.operations[None] = object()
+    stream.push("next", "{}")
+
+    class Response:
+        def __init__(self):
+            self.written = []
+
+        async def write(self, data):
+            self.written.append(data)
+            if len(self.written) == 1:
+                # The operation completes while its result is being written.
+                stream.push("complete", "")
+                stream.operations.clear()
+
+    response = Response()
+    await stream.write_to(response, 0, 1, until_idle=True)
+
+    events = parse_events(b"".join(response.written).decode())
+    assert [event["event"] for event in events] == ["next", "complete"]
+
+
+@pytest.mark.asyncio
+async def test_single_connection_errors(client):
+    token = await (await client.put("/graphql")).text()
+
+    assert (await start(client, "unknown", "a", "{ a }")).status == 404
+    assert (await start(client, token, "", "{ a }")).status == 400
+    for body, message in [
+        ([], "GraphQL params should be a dict."),
+        ({"query": "{ a }", "extensions": "x"}, "Extensions should be a dict."),
+    ]:
+        response = await client.post(
+            "/graphql", json=body, headers={TOKEN_HEADER: token}
+        )
+        assert response.status == 400
+        assert (await response.json())["errors"][0]["message"] == message
+    assert (
+        await client.delete(
+            "/graphql", params={"operationId": "a"}, headers={TOKEN_HEADER: token}
+        )
+    ).status == 200
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "app",
+    [
+        create_app(
+            schema=SubscriptionSchema, enable_async=True, sse=True, sse_heartbeat=0.01
+        )
+    ],
+)
+async def test_idle_stream_sends_heartbeats(app, client):
+    token = await (await client.put("/graphql")).text()
+    stream = await client.get(
+        "/graphql", headers={"accept": "text/event-stream", TOKEN_HEADER: token}
+    )
+
+    assert await stream.content.readuntil(b"\n\n") == b":\n\n"
+    stream.close()